@@ -3,13 +3,17 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from bill_calculator import BillCalculator
+from bill_pdf import create_bill_pdf, available_languages, LANGUAGES
+from bill_store import BillStore
+from customer_master import CustomerMaster, DEFAULT_MASTER_PATH
+from bulk_billing import BulkBillingRun, REQUIRED_COLUMNS, OPTIONAL_COLUMNS, new_invoice_prefix, sample_readings_csv
+import reconciliation
+from jobs import JobQueue, WorkerPool, ACTIVE_STATUSES
 import base64
-from io import BytesIO
 import datetime
 import tempfile
 import os
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import shutil
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib.units import inch
@@ -26,6 +30,10 @@ st.set_page_config(
 
 # Logo URL 
 LOGO_URL = "https://mir-s3-cdn-cf.behance.net/projects/404/d158eb92277443.Y3JvcCwxOTk5LDE1NjQsMCwyMTc.jpg"
+# Seconds to wait for the logo server before carrying on without the logo
+LOGO_TIMEOUT = 5
+# A downloaded (or failed) logo is reused for this long before it is fetched again
+LOGO_CACHE_SECONDS = 3600
 
 # Custom CSS for better styling
 def local_css():
@@ -113,15 +121,18 @@ def local_css():
     </style>
     """, unsafe_allow_html=True)
 
+@st.cache_resource(ttl=LOGO_CACHE_SECONDS)
 def download_and_save_logo():
-    """Download logo from URL and save it temporarily"""
+    """Download logo from URL once per server, not on every rerun, and save it temporarily"""
     try:
-        response = requests.get(LOGO_URL)
+        response = requests.get(LOGO_URL, timeout=LOGO_TIMEOUT)
         if response.status_code == 200:
             temp_dir = tempfile.gettempdir()
             logo_path = os.path.join(temp_dir, "ap_logo.jpg")
-            with open(logo_path, "wb") as f:
+            # Swapped in with one rename, so a bill being rendered never reads a half-written logo
+            with tempfile.NamedTemporaryFile(dir=temp_dir, suffix=".jpg", delete=False) as f:
                 f.write(response.content)
+            os.replace(f.name, logo_path)
             return logo_path
         else:
             return None
@@ -129,114 +140,105 @@ def download_and_save_logo():
         print(f"Error downloading logo: {e}")
         return None
 
-def generate_pdf(data):
+def copy_logo(work_dir):
+    """Private copy of the logo for a background job, unaffected when the shared one is refreshed"""
+    logo_path = download_and_save_logo()
+    if not logo_path or not os.path.exists(logo_path):
+        return None
+    return shutil.copy(logo_path, os.path.join(work_dir, "logo.jpg"))
+
+def generate_pdf(data, language="en"):
     """Generate a PDF bill with logo and bill details"""
-    # Create a PDF buffer
-    buffer = BytesIO()
-    
-    # Create the PDF
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Add logo
     logo_path = download_and_save_logo()
-    if logo_path and os.path.exists(logo_path):
-        try:
-            c.drawImage(logo_path, 40, height - 120, width=100, height=80)
-        except Exception as e:
-            print(f"Error adding logo to PDF: {e}")
-    
-    # Add header
-    c.setFont("Helvetica-Bold", 20)
-    c.drawString(150, height - 80, "Electricity Bill")
-    
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(40, height - 140, "Bill Invoice")
-    
-    # Add date
-    c.setFont("Helvetica", 12)
-    c.drawString(40, height - 160, f"Bill Date: {data['Bill_Date']}")
-    c.drawString(40, height - 180, f"Due Date: {data['Due_Date']}")
-    c.drawString(40, height - 200, f"Invoice #: AP-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}")
-    
-    # Customer information
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(40, height - 240, "Customer Information")
-    c.setFont("Helvetica", 12)
-    c.drawString(40, height - 260, f"Customer Name: {data['Customer_Name']}")
-    c.drawString(40, height - 280, f"Service ID: {data['Service_ID']}")
-    c.drawString(40, height - 300, f"Customer Type: {data['Customer_Type']}")
-    
-    # Billing information
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(40, height - 340, "Billing Information")
-    c.setFont("Helvetica", 12)
-    c.drawString(40, height - 360, f"Previous Reading: {data['Previous_Reading']} kWh")
-    c.drawString(40, height - 380, f"Current Reading: {data['Current_Reading']} kWh")
-    c.drawString(40, height - 400, f"Units Consumed: {data['Units_Consumed']} kWh")
-    
-    y_position = 400
-    
-    if "Peak_Hour_Units" in data:
-        y_position += 20
-        c.drawString(40, height - y_position, f"Peak Hour Units: {data['Peak_Hour_Units']} kWh")
-    
-    # Draw a line
-    y_position += 20
-    c.line(40, height - y_position, width - 40, height - y_position)
-    
-    # Bill summary
-    y_position += 40
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(40, height - y_position, "Bill Summary")
-    c.setFont("Helvetica", 12)
-    y_position += 20
-    c.drawString(40, height - y_position, f"Net Bill: ₹{data['Net_Bill']}")
-    y_position += 20
-    c.drawString(40, height - y_position, f"Service Charge (5%): ₹{data['Service_Charge']}")
-    y_position += 20
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(40, height - y_position, f"Total Bill: ₹{data['Total_Bill']}")
-    
-    # Late payment section
-    # y_position += 40
-    # c.setFont("Helvetica-Bold", 14)
-    # c.drawString(40, height - y_position, "Payment Information")
-    # c.setFont("Helvetica", 12)
-    # y_position += 20
-    # c.drawString(40, height - y_position, f"Payment Due Date: {data['Due_Date']}")
-    # y_position += 20
-    # c.drawString(40, height - y_position, f"Late Payment Fee (2%): ₹{data['Late_Fee']}")
-    # y_position += 20
-    # c.setFont("Helvetica-Bold", 12)
-    # c.drawString(40, height - y_position, f"Amount After Due Date: ₹{data['Amount_After_Due_Date']}")
-    
-    # Payment methods section
-    y_position += 40
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(40, height - y_position, "Payment Methods")
-    y_position += 20
-    c.setFont("Helvetica", 12)
-    c.drawString(40, height - y_position, "• Online: www.apspdcl.in")
-    y_position += 20
-    c.drawString(40, height - y_position, "• Mobile App: APSPDCL Mobile")
-    y_position += 20
-    c.drawString(40, height - y_position, "• In Person: Nearest APSPDCL Office")
-    
-    # Footer
-    c.setFont("Helvetica", 10)
-    c.drawString(width/2 - 100, 50, "© 2025 Electricity Bill Calculator | All Rights Reserved")
-    c.drawString(width/2 - 100, 30, "Please pay the bill in-time to avoid service interruption")
-    
-    # Save the PDF
-    c.showPage()
-    c.save()
-    
-    # Get the PDF value from the buffer
-    buffer.seek(0)
-    b64 = base64.b64encode(buffer.getvalue()).decode()
+    pdf_bytes = create_bill_pdf(data, logo_path, language)
+    b64 = base64.b64encode(pdf_bytes).decode()
     return f'<a href="data:application/pdf;base64,{b64}" download="electricity_bill.pdf" class="download-btn">📄 Download Bill as PDF</a>'
 
+@st.cache_resource
+def get_bill_store():
+    """Shared bill ledger for all sessions"""
+    return BillStore()
+
+# Background worker processes started with the app; 0 if workers run separately (python jobs.py)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+@st.cache_resource
+def start_job_workers():
+    """Worker processes shared by all sessions, started once per server"""
+    return WorkerPool(workers=JOB_WORKERS).start()
+
+@st.cache_resource
+def get_job_queue():
+    """Shared background job queue"""
+    if JOB_WORKERS > 0:
+        start_job_workers()
+    return JobQueue()
+
+def current_job(job_queue, name):
+    """Job whose id is kept in the page URL under name, so it survives a refresh"""
+    job_id = st.query_params.get(name)
+    return job_queue.status(int(job_id)) if job_id and job_id.isdigit() else None
+
+def read_on_click(path):
+    """Download data that is read from disk only when the clerk clicks, not on every rerun"""
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
+def replace_job(job_queue, name):
+    """Stop the job kept in the URL under name and remove its files before a new one takes its place"""
+    previous_job = current_job(job_queue, name)
+    if previous_job:
+        # A running job removes its own files when it stops
+        job_queue.cancel(previous_job["id"])
+        if previous_job["status"] == "done" and previous_job["params"].get("work_dir"):
+            shutil.rmtree(previous_job["params"]["work_dir"], ignore_errors=True)
+    st.query_params.pop(name, None)
+
+def submit_upload_job(job_queue, kind, uploaded_file, **params):
+    """Save an uploaded file to a new work directory and queue a job to process it"""
+    work_dir = tempfile.mkdtemp(prefix=f"{kind}_")
+    path = os.path.join(work_dir, "upload_" + os.path.basename(uploaded_file.name))
+    with open(path, "wb") as f:
+        shutil.copyfileobj(uploaded_file, f)
+    return job_queue.submit(kind, {"path": path, "filename": uploaded_file.name, "work_dir": work_dir, **params})
+
+@st.fragment(run_every=1.0)
+def job_progress(job_id, text):
+    """Progress of a background job, refreshed every second until it finishes"""
+    job_queue = get_job_queue()
+    job = job_queue.status(job_id)
+    if job["status"] not in ACTIVE_STATUSES:
+        # Rerun the whole page to show the outcome
+        st.rerun()
+    total = job["progress_total"]
+    if job["status"] == "queued":
+        st.progress(0.0, text=f"{text}: waiting for a worker...")
+    elif not total:
+        st.progress(0.0, text=f"{text}: starting...")
+    else:
+        st.progress(min(job["progress_done"] / total, 1.0), text=f"{text}: {job['progress_done']:,} of {total:,}")
+    if job["cancel_requested"]:
+        st.caption("Cancelling...")
+    elif st.button("Cancel", key=f"cancel_job_{job_id}"):
+        job_queue.cancel(job_id)
+
+@st.cache_resource
+def load_customer_master(path, modified):
+    """Customer master shared by all sessions, reloaded when the file changes"""
+    return CustomerMaster.from_file(path)
+
+def get_customer_master():
+    """Customer master for autocomplete, or None if no master file is present"""
+    if not os.path.exists(DEFAULT_MASTER_PATH):
+        return None
+    try:
+        return load_customer_master(DEFAULT_MASTER_PATH, os.path.getmtime(DEFAULT_MASTER_PATH))
+    except Exception as e:
+        print(f"Error loading customer master: {e}")
+        return None
+
 def main():
     local_css()
     
@@ -247,12 +249,14 @@ def main():
     
     # Initialize bill calculator
     bill_calculator = BillCalculator()
+    bill_store = get_bill_store()
+    job_queue = get_job_queue()
     
     # Download logo once at startup
     logo_path = download_and_save_logo()
     
     # Sidebar for navigation and info
-    # with st.sidebar:
+    with st.sidebar:
     #     if logo_path and os.path.exists(logo_path):
     #         try:
     #             st.image(logo_path, width=250)
@@ -261,8 +265,8 @@ def main():
     #     else:
     #         st.image("https://api.placeholder.com/400/320", width=250)
         
-    #     st.markdown("<h3>Navigation</h3>", unsafe_allow_html=True)
-    #     page = st.radio("Navigation", ["Calculate Bill", "Tariff Information", "Bill History", "Help"], label_visibility="collapsed")
+        st.markdown("<h3>Navigation</h3>", unsafe_allow_html=True)
+        page = st.radio("Navigation", ["Calculate Bill", "Bulk Billing", "Payment Reconciliation", "Tariff Information", "Bill History", "Summary Dashboard", "Help"], label_visibility="collapsed")
         
         st.markdown("---")
         st.markdown("<div class='info-box'>This calculator helps you estimate electricity bills for different customer types based on meter readings.</div>", unsafe_allow_html=True)
@@ -280,17 +284,51 @@ def main():
             st.markdown("<div class='card'>", unsafe_allow_html=True)
             st.markdown("<h2>Customer Information</h2>", unsafe_allow_html=True)
             
+            # Customer lookup fills in the fields below from the master and the last bill
+            customer_master = get_customer_master()
+            if customer_master is not None:
+                customer_query = st.text_input(
+                    "Find Customer",
+                    placeholder="Start typing a service ID or name and press Enter",
+                    help="Search the customer master by service ID or any part of the name"
+                )
+                matches = {c["service_id"]: c for c in customer_master.search(customer_query)} if customer_query else {}
+                if matches:
+                    selected_id = st.selectbox(
+                        "Matching Customers",
+                        list(matches),
+                        index=None,
+                        format_func=lambda s: f"{s} - {matches[s]['customer_name']} ({matches[s]['customer_type']})",
+                        placeholder=f"{len(matches)} matching customers"
+                    )
+                    if selected_id and st.session_state.get("selected_customer") != selected_id:
+                        customer = matches[selected_id]
+                        st.session_state.selected_customer = selected_id
+                        st.session_state.service_id = customer["service_id"]
+                        st.session_state.customer_name = customer["customer_name"]
+                        if customer["customer_type"] in ["Domestic", "Commercial", "Industrial"]:
+                            st.session_state.customer_type = customer["customer_type"]
+                        # A customer who has never been billed starts from a zero reading, not the last customer's
+                        last_bill = bill_store.last_bill(selected_id)
+                        st.session_state.previous_reading = float(last_bill["current_reading"] or 0.0) if last_bill else 0.0
+                    if selected_id and matches[selected_id]["customer_type"] not in ["Domestic", "Commercial", "Industrial"]:
+                        st.warning(f"The customer master lists this customer as '{matches[selected_id]['customer_type']}'. "
+                                   "Please choose the customer type below.")
+                elif customer_query:
+                    st.caption("No matching customers")
+            
             customer_type = st.selectbox(
                 "Customer Type",
                 ["Domestic", "Commercial", "Industrial"],
+                key="customer_type",
                 help="Select the appropriate customer type for accurate billing"
             )
             
             col_a, col_b = st.columns(2)
             with col_a:
-                service_id = st.text_input("Service ID", help="Enter your unique service identifier")
+                service_id = st.text_input("Service ID", key="service_id", help="Enter your unique service identifier")
             with col_b:
-                customer_name = st.text_input("Customer Name", help="Enter the name on the account")
+                customer_name = st.text_input("Customer Name", key="customer_name", help="Enter the name on the account")
             
             # Display info about the selected customer type
             if customer_type == "Domestic":
@@ -344,6 +382,7 @@ def main():
                 previous_reading = st.number_input(
                     "Previous Reading (kWh)",
                     min_value=0.0,
+                    key="previous_reading",
                     step=0.1,
                     format="%.1f",
                     help="Enter the previous meter reading"
@@ -360,6 +399,15 @@ def main():
                     help="Enter the number of units consumed during peak hours"
                 )
             
+            bill_languages = available_languages()
+            bill_language = st.selectbox(
+                "Bill Language",
+                list(bill_languages),
+                help="Language of the downloadable PDF bill"
+            )
+            if len(bill_languages) < len(LANGUAGES):
+                st.caption("Telugu bills need a Telugu font such as NotoSansTelugu-Regular.ttf in fonts/ or BILL_FONT_DIR.")
+            
             calculate_button = st.button("Calculate Bill", use_container_width=True)
             st.markdown("</div>", unsafe_allow_html=True)
         
@@ -407,8 +455,11 @@ def main():
                         elif days_remaining <= 7:
                             st.markdown(f"<div class='due-date-warning'>⚠️ Due date approaching! {days_remaining} days remaining for payment.</div>", unsafe_allow_html=True)
                         
+                        invoice_no = new_invoice_prefix()
+                        
                         # Create bill data for download
                         bill_data = {
+                            "Invoice_No": invoice_no,
                             "Customer_Type": customer_type,
                             "Service_ID": service_id,
                             "Customer_Name": customer_name,
@@ -456,21 +507,17 @@ def main():
                         )
                         st.plotly_chart(fig, use_container_width=True)
                         
-                        # Save bill history
-                        if 'bill_history' not in st.session_state:
-                            st.session_state.bill_history = []
-                        
-                        # Add current bill to history
-                        bill_history_entry = {
-                            "invoice_no": f"AP-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}",
-                            "customer_name": customer_name,
+                        # Write to the ledger; this also updates the dashboard aggregates and Bill History
+                        bill_store.add_bill({
+                            "invoice_no": invoice_no,
                             "service_id": service_id,
-                            "bill_date": result['bill_date'],
-                            "due_date": result['due_date'],
-                            "units_consumed": result['units_consumed'],
-                            "total_amount": result['total_bill']
-                        }
-                        st.session_state.bill_history.append(bill_history_entry)
+                            "customer_name": customer_name,
+                            "customer_type": customer_type,
+                            "previous_reading": previous_reading,
+                            "current_reading": current_reading,
+                            "peak_hour_units": peak_hour_units if customer_type == "Industrial" else None,
+                            **result
+                        })
                         
                         # Bill preview (before download)
                         with st.expander("Preview Bill Before Download"):
@@ -495,7 +542,7 @@ def main():
                                 st.markdown("**Bill Details**")
                                 st.write(f"Bill Date: {result['bill_date']}")
                                 st.write(f"Due Date: {result['due_date']}")
-                                st.write(f"Invoice #: AP-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}")
+                                st.write(f"Invoice #: {invoice_no}")
                             
                             st.markdown("---")
                             
@@ -520,7 +567,7 @@ def main():
                         
                         # Download options
                         st.markdown("<h3>Download Bill</h3>", unsafe_allow_html=True)
-                        st.markdown(generate_pdf(bill_data), unsafe_allow_html=True)
+                        st.markdown(generate_pdf(bill_data, LANGUAGES[bill_language]), unsafe_allow_html=True)
                         
                     except ValueError as e:
                         st.error(str(e))
@@ -550,6 +597,164 @@ def main():
             
             st.markdown("</div>", unsafe_allow_html=True)
     
+    elif page == "Bulk Billing":
+        # Bulk billing page
+        st.markdown("<h2>Bulk Billing</h2>", unsafe_allow_html=True)
+        
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.markdown(f"""
+        <div class='info-box'>
+        Upload a CSV or Excel (.xlsx) file with one meter reading per row.<br>
+        <strong>Required columns:</strong> {', '.join(REQUIRED_COLUMNS)}<br>
+        <strong>Optional columns:</strong> {', '.join(OPTIONAL_COLUMNS)} (Industrial customers only)
+        </div>
+        """, unsafe_allow_html=True)
+        st.download_button(
+            "Download Sample File",
+            sample_readings_csv(),
+            file_name="readings_template.csv",
+            mime="text/csv"
+        )
+        
+        uploaded_file = st.file_uploader("Readings File", type=["csv", "xlsx"])
+        process_button = st.button("Process File", use_container_width=True, disabled=uploaded_file is None)
+        st.markdown("</div>", unsafe_allow_html=True)
+        
+        if process_button and uploaded_file is not None:
+            # Stop the previous run and drop its results before starting a new one
+            replace_job(job_queue, "pdf_job")
+            replace_job(job_queue, "bulk_job")
+            st.query_params["bulk_job"] = str(submit_upload_job(job_queue, "bulk_billing", uploaded_file))
+        
+        # Billing runs in a background worker; the page polls its progress
+        bulk_job = current_job(job_queue, "bulk_job")
+        if bulk_job and bulk_job["status"] in ACTIVE_STATUSES:
+            job_progress(bulk_job["id"], "Calculating bills")
+        elif bulk_job and bulk_job["status"] == "failed":
+            st.error(bulk_job["error"])
+            st.caption("No bills from this run were kept in the ledger; fix the file and process it again.")
+        elif bulk_job and bulk_job["status"] == "cancelled":
+            st.warning("Billing was cancelled. No bills from this run were kept in the ledger.")
+        elif bulk_job and not os.path.exists(BulkBillingRun.from_state(bulk_job["result"]).results_path):
+            st.warning("The results of this run are no longer available. Please process the file again.")
+        elif bulk_job:
+            bulk_run = BulkBillingRun.from_state(bulk_job["result"])
+            st.success(f"Processed {bulk_run.total_rows:,} readings")
+            
+            # Summary metrics
+            col_bulk1, col_bulk2, col_bulk3, col_bulk4 = st.columns(4)
+            col_bulk1.metric("Readings", f"{bulk_run.total_rows:,}")
+            col_bulk2.metric("Bills Calculated", f"{bulk_run.billed_rows:,}")
+            col_bulk3.metric("Rows With Errors", f"{bulk_run.error_rows:,}")
+            col_bulk4.metric("Total Billed", f"₹{bulk_run.total_amount:,.2f}")
+            
+            # Paginated results table
+            st.markdown("<h3>Results</h3>", unsafe_allow_html=True)
+            page_size = 100
+            page_count = max((bulk_run.total_rows + page_size - 1) // page_size, 1)
+            result_page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+            st.caption(f"Page {result_page} of {page_count:,}")
+            st.dataframe(bulk_run.read_page(result_page - 1, page_size), use_container_width=True, hide_index=True)
+            
+            # Downloads
+            st.markdown("<h3>Download Results</h3>", unsafe_allow_html=True)
+            col_dl1, col_dl2 = st.columns(2)
+            with col_dl1:
+                st.download_button(
+                    "Download Results (CSV)",
+                    read_on_click(bulk_run.results_path),
+                    file_name="bill_results.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+            with col_dl2:
+                if os.path.exists(bulk_run.pdf_zip_path):
+                    st.download_button(
+                        "Download PDF Bills (ZIP)",
+                        read_on_click(bulk_run.pdf_zip_path),
+                        file_name="bill_pdfs.zip",
+                        mime="application/zip",
+                        use_container_width=True
+                    )
+                else:
+                    pdf_job = current_job(job_queue, "pdf_job")
+                    if pdf_job and pdf_job["status"] in ACTIVE_STATUSES:
+                        job_progress(pdf_job["id"], "Generating PDF bills")
+                    else:
+                        if pdf_job and pdf_job["status"] == "failed":
+                            st.error(pdf_job["error"])
+                        bill_languages = available_languages()
+                        pdf_language = st.selectbox("Bill Language", list(bill_languages), key="bulk_pdf_language")
+                        if len(bill_languages) < len(LANGUAGES):
+                            st.caption("Telugu bills need a Telugu font such as NotoSansTelugu-Regular.ttf in fonts/ or BILL_FONT_DIR.")
+                        if st.button("Generate PDF Bills (ZIP)", use_container_width=True):
+                            st.query_params["pdf_job"] = str(job_queue.submit("pdf_zip", {
+                                "run": bulk_job["result"],
+                                "logo_path": copy_logo(bulk_job["result"]["work_dir"]),
+                                "language": bill_languages[pdf_language]
+                            }))
+                            st.rerun()
+    
+    elif page == "Payment Reconciliation":
+        # Payment reconciliation page
+        st.markdown("<h2>Payment Reconciliation</h2>", unsafe_allow_html=True)
+        
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.markdown(f"""
+        <div class='info-box'>
+        Upload a bank or mobile app payment file (CSV or .xlsx) to match payments to bills.<br>
+        <strong>Required columns:</strong> {', '.join(reconciliation.REQUIRED_COLUMNS)}<br>
+        <strong>Optional columns:</strong> {', '.join(reconciliation.OPTIONAL_COLUMNS)}<br>
+        Payments made by the due date are checked against the total bill, later payments against the amount after due date.
+        </div>
+        """, unsafe_allow_html=True)
+        st.download_button(
+            "Download Sample File",
+            reconciliation.sample_payments_csv(),
+            file_name="payments_template.csv",
+            mime="text/csv"
+        )
+        
+        payment_file = st.file_uploader("Payment File", type=["csv", "xlsx"])
+        apply_payments = st.checkbox("Record matched payments in the ledger", value=True)
+        dayfirst = st.checkbox("Payment dates are dd/mm/yyyy", value=False,
+                               help="Otherwise Payment_Date must be yyyy-mm-dd. Dates in any other format are reported as invalid.")
+        reconcile_button = st.button("Reconcile Payments", use_container_width=True, disabled=payment_file is None)
+        st.markdown("</div>", unsafe_allow_html=True)
+        
+        if reconcile_button and payment_file is not None:
+            replace_job(job_queue, "reconciliation_job")
+            st.query_params["reconciliation_job"] = str(
+                submit_upload_job(job_queue, "reconciliation", payment_file, apply=apply_payments, dayfirst=dayfirst)
+            )
+        
+        reconciliation_job = current_job(job_queue, "reconciliation_job")
+        if reconciliation_job and reconciliation_job["status"] in ACTIVE_STATUSES:
+            job_progress(reconciliation_job["id"], "Matching payments")
+        elif reconciliation_job and reconciliation_job["status"] == "failed":
+            st.error(reconciliation_job["error"])
+            st.caption("No payments from this run were recorded in the ledger; fix the file and reconcile it again.")
+        elif reconciliation_job and reconciliation_job["status"] == "cancelled":
+            st.warning("Reconciliation was cancelled. No payments from this run were recorded in the ledger.")
+        elif reconciliation_job and not os.path.exists(reconciliation.ReconciliationRun.from_state(reconciliation_job["result"]).results_path):
+            st.warning("The report of this run is no longer available. Please reconcile the file again.")
+        elif reconciliation_job:
+            reconciliation_run = reconciliation.ReconciliationRun.from_state(reconciliation_job["result"], bill_store)
+            summary_df = reconciliation_run.summary_frame()
+            
+            st.markdown("<h3>Summary</h3>", unsafe_allow_html=True)
+            for col, row in zip(st.columns(len(summary_df)), summary_df.itertuples()):
+                col.metric(row.Status, f"{row.Payments:,}", f"₹{row.Amount:,.2f}", delta_color="off")
+            
+            st.dataframe(summary_df, use_container_width=True, hide_index=True)
+            st.download_button(
+                "Download Reconciliation Report (CSV)",
+                read_on_click(reconciliation_run.results_path),
+                file_name="reconciliation.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+    
     elif page == "Tariff Information":
         # Tariff information page
         st.markdown("<h2>Electricity Tariff Structure</h2>", unsafe_allow_html=True)
@@ -646,61 +851,131 @@ def main():
         # Bill history page
         st.markdown("<h2>Bill History</h2>", unsafe_allow_html=True)
         
-        if 'bill_history' not in st.session_state or not st.session_state.bill_history:
+        # Everything on this page comes from the ledger, so it shows bills from every session and bulk run
+        service_ids = bill_store.recent_services()
+        if not service_ids:
             st.info("No bill history available. Generate a bill first.")
         else:
             st.markdown("<div class='bill-history'>", unsafe_allow_html=True)
-            history_df = pd.DataFrame(st.session_state.bill_history)
-            
-            # Display bill history table
-            st.dataframe(
-                history_df,
-                column_config={
-                    "invoice_no": "Invoice Number",
-                    "customer_name": "Customer Name",
-                    "service_id": "Service ID",
-                    "bill_date": "Bill Date",
-                    "due_date": "Due Date",
-                    "units_consumed": "Units Consumed",
-                    "total_amount": "Total Amount (₹)"
-                },
-                use_container_width=True
+            current_id = st.session_state.get("service_id", "").strip().upper()
+            if current_id and current_id not in service_ids:
+                service_ids.insert(0, current_id)
+            history_service_id = st.selectbox(
+                "Service ID",
+                service_ids,
+                index=service_ids.index(current_id) if current_id in service_ids else 0,
+                accept_new_options=True,
+                help="Recently billed services; type any other service ID to look it up"
             )
+            history_df = bill_store.service_bills(history_service_id)
             
-            # Add visualization of bill history
-            st.markdown("<h3>Bill History Trends</h3>", unsafe_allow_html=True)
+            if history_df.empty:
+                st.info(f"No bills found for {history_service_id}.")
+            else:
+                # Display bill history table
+                st.dataframe(
+                    history_df,
+                    column_config={
+                        "invoice_no": "Invoice Number",
+                        "customer_name": "Customer Name",
+                        "bill_date": "Bill Date",
+                        "due_date": "Due Date",
+                        "units_consumed": "Units Consumed",
+                        "total_bill": "Total Amount (₹)",
+                        "paid_amount": "Paid (₹)"
+                    },
+                    use_container_width=True
+                )
+                
+                # Trends come from the ledger's monthly aggregates, not from raw bill rows
+                st.markdown("<h3>Bill History Trends</h3>", unsafe_allow_html=True)
+                monthly_df = bill_store.service_monthly(history_service_id)
+                
+                # Line chart for consumption
+                fig1 = px.line(
+                    monthly_df, 
+                    x='month', 
+                    y='units',
+                    markers=True,
+                    labels={'month': 'Billing Month', 'units': 'Units Consumed (kWh)'},
+                    title='Consumption Trend'
+                )
+                st.plotly_chart(fig1, use_container_width=True)
+                
+                # Line chart for bill amount
+                fig2 = px.line(
+                    monthly_df, 
+                    x='month', 
+                    y='amount',
+                    markers=True,
+                    labels={'month': 'Billing Month', 'amount': 'Total Bill Amount (₹)'},
+                    title='Bill Amount Trend'
+                )
+                st.plotly_chart(fig2, use_container_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+    
+    elif page == "Summary Dashboard":
+        # Utility-wide KPIs, read from the ledger's aggregate tables
+        st.markdown("<h2>Summary Dashboard</h2>", unsafe_allow_html=True)
+        
+        category_df = bill_store.category_monthly()
+        if category_df.empty:
+            st.info("No bills in the ledger yet. Generate a bill first.")
+        else:
+            overdue_df = bill_store.overdue_totals()
             
-            # Convert bill date to datetime
-            history_df['bill_date'] = pd.to_datetime(history_df['bill_date'])
+            col_kpi1, col_kpi2, col_kpi3, col_kpi4 = st.columns(4)
+            col_kpi1.metric("Bills", f"{int(category_df['bill_count'].sum()):,}")
+            col_kpi2.metric("Units Billed", f"{category_df['units'].sum():,.0f} kWh")
+            col_kpi3.metric("Revenue", f"₹{category_df['amount'].sum():,.2f}")
+            col_kpi4.metric("Overdue", f"₹{overdue_df['overdue_amount'].sum():,.2f}")
             
-            # Line chart for consumption
-            fig1 = px.line(
-                history_df.sort_values('bill_date'), 
-                x='bill_date', 
-                y='units_consumed',
-                markers=True,
-                labels={'bill_date': 'Billing Date', 'units_consumed': 'Units Consumed (kWh)'},
-                title='Consumption Trend'
-            )
-            st.plotly_chart(fig1, use_container_width=True)
+            col_dash1, col_dash2 = st.columns(2)
+            with col_dash1:
+                # Revenue by customer type
+                revenue_df = category_df.groupby('customer_type', as_index=False)['amount'].sum()
+                fig = px.pie(
+                    revenue_df,
+                    names='customer_type',
+                    values='amount',
+                    hole=.4,
+                    title='Revenue by Customer Type'
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            with col_dash2:
+                # Overdue totals by customer type
+                fig = px.bar(
+                    overdue_df,
+                    x='customer_type',
+                    y='overdue_amount',
+                    labels={'customer_type': 'Customer Type', 'overdue_amount': 'Overdue Amount (₹)'},
+                    title='Overdue Totals'
+                )
+                st.plotly_chart(fig, use_container_width=True)
             
-            # Line chart for bill amount
-            fig2 = px.line(
-                history_df.sort_values('bill_date'), 
-                x='bill_date', 
-                y='total_amount',
+            # Monthly revenue per customer type
+            fig = px.line(
+                category_df,
+                x='month',
+                y='amount',
+                color='customer_type',
                 markers=True,
-                labels={'bill_date': 'Billing Date', 'total_amount': 'Total Bill Amount (₹)'},
-                title='Bill Amount Trend'
+                labels={'month': 'Billing Month', 'amount': 'Revenue (₹)', 'customer_type': 'Customer Type'},
+                title='Monthly Revenue'
             )
-            st.plotly_chart(fig2, use_container_width=True)
-            st.markdown("</div>", unsafe_allow_html=True)
+            st.plotly_chart(fig, use_container_width=True)
             
-            # Option to clear history
-            if st.button("Clear Bill History"):
-                st.session_state.bill_history = []
-                st.success("Bill history cleared successfully!")
-                st.rerun()
+            # Units consumed histogram
+            histogram_df = bill_store.units_histogram()
+            fig = px.bar(
+                histogram_df,
+                x='units_range',
+                y='bill_count',
+                color='customer_type',
+                labels={'units_range': 'Units Consumed (kWh)', 'bill_count': 'Bills', 'customer_type': 'Customer Type'},
+                title='Units Consumed Distribution'
+            )
+            st.plotly_chart(fig, use_container_width=True)
     
     elif page == "Help":
         # Help page
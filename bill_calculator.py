@@ -1,3 +1,12 @@
+import numpy as np
+import pandas as pd
+
+
+def _round2(values):
+    # np.round differs from round() on half-cent values; bills must match calculate_bill
+    return np.array([round(v, 2) for v in values.tolist()], dtype=float)
+
+
 class BillCalculator:
     def __init__(self):
         # Constants for tariff rates
@@ -74,3 +83,70 @@ class BillCalculator:
             "late_fee": late_fee,
             "amount_after_due_date": round(total_bill + late_fee, 2)
         }
+
+    def calculate_bills(self, readings):
+        """Vectorised calculate_bill over a DataFrame of readings.
+
+        Expects Customer_Type, Current_Reading, Previous_Reading and Bill_Date
+        columns, plus an optional Peak_Hour_Units column. Rows calculate_bill
+        would reject get a message in the "error" column instead of raising.
+        """
+        customer_type = readings["Customer_Type"].astype(str).str.strip().str.lower()
+        current = pd.to_numeric(readings["Current_Reading"], errors="coerce")
+        previous = pd.to_numeric(readings["Previous_Reading"], errors="coerce")
+        if "Peak_Hour_Units" in readings:
+            peak = pd.to_numeric(readings["Peak_Hour_Units"], errors="coerce").fillna(0)
+        else:
+            peak = pd.Series(0.0, index=readings.index)
+        # Same fixed format as calculate_bill, so a bill date is never guessed day-first
+        bill_date = pd.to_datetime(readings["Bill_Date"], format="%Y-%m-%d", errors="coerce")
+
+        units = (current - previous).to_numpy(dtype=float)
+        positive = units > 0
+
+        domestic = np.select(
+            [units <= 100, units <= 200],
+            [units * self.DOMESTIC_RATE_TIER1,
+             100 * self.DOMESTIC_RATE_TIER1 + (units - 100) * self.DOMESTIC_RATE_TIER2],
+            100 * self.DOMESTIC_RATE_TIER1 + 100 * self.DOMESTIC_RATE_TIER2 + (units - 200) * self.DOMESTIC_RATE_TIER3
+        )
+        commercial = units * self.COMMERCIAL_RATE
+        peak = peak.to_numpy(dtype=float)
+        normal_units = units - peak
+        peak_units = np.where(normal_units < 0, units, peak)
+        industrial = peak_units * self.INDUSTRIAL_RATE_PEAK + np.maximum(normal_units, 0) * self.INDUSTRIAL_RATE_NORMAL
+
+        net_bill = np.select(
+            [customer_type == "domestic", customer_type == "commercial", customer_type == "industrial"],
+            [domestic, commercial, industrial],
+            np.nan
+        )
+        net_bill = np.where(positive, net_bill, 0.0)
+
+        error = pd.Series(None, index=readings.index, dtype=object)
+        error[bill_date.isna()] = "Invalid bill date"
+        error[~customer_type.isin(["domestic", "commercial", "industrial"])] = \
+            "Invalid customer type. Must be Domestic, Commercial, or Industrial"
+        error[current < previous] = "Current reading cannot be less than previous reading"
+        error[current.isna() | previous.isna()] = "Invalid meter reading"
+        failed = error.notna().to_numpy()
+
+        net_bill = np.where(failed, np.nan, net_bill)
+        service_charge = net_bill * self.SERVICE_CHARGE_PERCENTAGE
+        total_bill = net_bill + service_charge
+        late_fee = _round2(total_bill * self.LATE_FEE_PERCENTAGE)
+
+        # Due date is 21 days from bill date, as in calculate_bill
+        due_date = bill_date + pd.Timedelta(days=21)
+
+        return pd.DataFrame({
+            "units_consumed": np.where(failed, np.nan, units),
+            "bill_date": bill_date.dt.strftime("%Y-%m-%d").where(~failed),
+            "due_date": due_date.dt.strftime("%Y-%m-%d").where(~failed),
+            "net_bill": _round2(net_bill),
+            "service_charge": _round2(service_charge),
+            "total_bill": _round2(total_bill),
+            "late_fee": late_fee,
+            "amount_after_due_date": _round2(total_bill + late_fee),
+            "error": error
+        }, index=readings.index)
@@ -0,0 +1,375 @@
+import datetime
+import functools
+import inspect
+import logging
+import os
+import re
+import tempfile
+from io import BytesIO
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+try:
+    import uharfbuzz  # noqa: F401  (lets ReportLab shape Telugu conjuncts)
+    SHAPING = "shaping" in inspect.signature(canvas.Canvas.drawString).parameters
+except ImportError:
+    SHAPING = False
+
+# TrueType fonts for text Helvetica cannot print (₹, Telugu), first match
+# wins. Set BILL_FONT_DIR to a folder holding other fonts if needed.
+FONT_FILES = {
+    "unicode": ["NotoSans-Regular.ttf", "DejaVuSans.ttf", "FreeSans.ttf", "Nirmala.ttf"],
+    "unicode_bold": ["NotoSans-Bold.ttf", "DejaVuSans-Bold.ttf", "FreeSansBold.ttf", "NirmalaB.ttf"],
+    "telugu": ["NotoSansTelugu-Regular.ttf", "Lohit-Telugu.ttf", "Pothana2000.ttf", "gautami.ttf", "Nirmala.ttf"],
+    "telugu_bold": ["NotoSansTelugu-Bold.ttf", "gautamib.ttf", "NirmalaB.ttf"],
+}
+
+FONT_DIRS = [
+    os.environ.get("BILL_FONT_DIR"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts"),
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+    os.path.expanduser("~/.local/share/fonts"),
+    "/Library/Fonts",
+    "/System/Library/Fonts/Supplemental",
+    "C:\\Windows\\Fonts",
+]
+
+TELUGU_RUN = re.compile(r"[\u0C00-\u0C7F\u200C\u200D]+(?:\s+[\u0C00-\u0C7F\u200C\u200D]+)*")
+
+LABELS = {
+    "en": {
+        "title": "Electricity Bill",
+        "invoice_heading": "Bill Invoice",
+        "bill_date": "Bill Date",
+        "due_date": "Due Date",
+        "invoice_no": "Invoice #",
+        "customer_heading": "Customer Information",
+        "customer_name": "Customer Name",
+        "service_id": "Service ID",
+        "customer_type": "Customer Type",
+        "billing_heading": "Billing Information",
+        "previous_reading": "Previous Reading",
+        "current_reading": "Current Reading",
+        "units_consumed": "Units Consumed",
+        "peak_hour_units": "Peak Hour Units",
+        "summary_heading": "Bill Summary",
+        "net_bill": "Net Bill",
+        "service_charge": "Service Charge (5%)",
+        "total_bill": "Total Bill",
+        "payment_heading": "Payment Methods",
+        "pay_online": "• Online: www.apspdcl.in",
+        "pay_app": "• Mobile App: APSPDCL Mobile",
+        "pay_office": "• In Person: Nearest APSPDCL Office",
+        "footer": "© 2025 Electricity Bill Calculator | All Rights Reserved",
+        "footer_note": "Please pay the bill in-time to avoid service interruption",
+        "customer_types": {},
+    },
+    "te": {
+        "title": "విద్యుత్ బిల్లు",
+        "invoice_heading": "బిల్లు ఇన్వాయిస్",
+        "bill_date": "బిల్లు తేదీ",
+        "due_date": "చెల్లింపు గడువు తేదీ",
+        "invoice_no": "ఇన్వాయిస్ నం.",
+        "customer_heading": "వినియోగదారుని వివరాలు",
+        "customer_name": "వినియోగదారుని పేరు",
+        "service_id": "సర్వీస్ నంబర్",
+        "customer_type": "వినియోగదారుని రకం",
+        "billing_heading": "బిల్లింగ్ వివరాలు",
+        "previous_reading": "గత రీడింగ్",
+        "current_reading": "ప్రస్తుత రీడింగ్",
+        "units_consumed": "వినియోగించిన యూనిట్లు",
+        "peak_hour_units": "పీక్ అవర్ యూనిట్లు",
+        "summary_heading": "బిల్లు సారాంశం",
+        "net_bill": "నికర బిల్లు",
+        "service_charge": "సర్వీస్ ఛార్జ్ (5%)",
+        "total_bill": "మొత్తం బిల్లు",
+        "payment_heading": "చెల్లింపు పద్ధతులు",
+        "pay_online": "• ఆన్‌లైన్: www.apspdcl.in",
+        "pay_app": "• మొబైల్ యాప్: APSPDCL Mobile",
+        "pay_office": "• నేరుగా: సమీప APSPDCL కార్యాలయం",
+        "footer": "© 2025 విద్యుత్ బిల్లు కాలిక్యులేటర్ | అన్ని హక్కులు రక్షించబడ్డాయి",
+        "footer_note": "సేవలో అంతరాయం లేకుండా ఉండేందుకు బిల్లును గడువులోగా చెల్లించండి",
+        "customer_types": {"Domestic": "గృహ", "Commercial": "వాణిజ్య", "Industrial": "పారిశ్రామిక"},
+    },
+}
+
+LANGUAGES = {"English": "en", "తెలుగు (Telugu)": "te"}
+
+
+@functools.lru_cache(maxsize=None)
+def _font_index():
+    """Map lower-case font file names to paths, scanning the font folders once"""
+    index = {}
+    for font_dir in FONT_DIRS:
+        if not font_dir or not os.path.isdir(font_dir):
+            continue
+        for root, _, files in os.walk(font_dir):
+            for name in files:
+                index.setdefault(name.lower(), os.path.join(root, name))
+    return index
+
+
+def _trimmed_font(path, shaped=False):
+    """Path of a copy of the font without hinting and licence strings.
+
+    ReportLab copies the name and hinting tables into every embedded subset,
+    which can be several times the size of the glyphs a bill actually uses.
+    The trimmed copy is cached in the temp folder, so only the first process
+    pays for trimming. Returns the original path if fontTools is missing.
+    """
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont as FontToolsFont
+    except ImportError:
+        return path
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache_dir = os.path.join(tempfile.gettempdir(), "bill_fonts")
+    cache_path = os.path.join(cache_dir, f"{name}-{int(os.path.getmtime(path))}{'-shaped' if shaped else ''}.ttf")
+    if os.path.exists(cache_path):
+        return cache_path
+
+    options = subset.Options()
+    options.name_IDs = [1, 2, 4, 6]
+    options.name_languages = [0x409]
+    options.hinting = False
+    options.glyph_names = False
+    if shaped:
+        options.layout_features = ["*"]  # uharfbuzz needs GSUB/GPOS to shape Telugu
+    else:
+        options.layout_features = []
+        options.drop_tables += ["GSUB", "GPOS", "GDEF", "kern", "MATH"]
+    logging.getLogger("fontTools.subset").setLevel(logging.ERROR)
+    font = FontToolsFont(path, lazy=True)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=font.getBestCmap().keys())
+    subsetter.subset(font)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    font.save(temp_path)
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+@functools.lru_cache(maxsize=None)
+def register_font(slot):
+    """Register the first available font for a slot once per process; None if there is none"""
+    for file_name in FONT_FILES[slot]:
+        path = _font_index().get(file_name.lower())
+        if not path:
+            continue
+        try:
+            # ReportLab embeds only the glyphs each document uses; asciiReadable
+            # would otherwise pull every ASCII glyph into the first subset
+            pdfmetrics.registerFont(TTFont(f"Bill-{slot}", _trimmed_font(path, slot.startswith("telugu")), asciiReadable=False))
+            return f"Bill-{slot}"
+        except Exception as e:
+            print(f"Error loading font {path}: {e}")
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_bill_fonts(language="en", embed_fonts=True):
+    """Fonts used for text Helvetica cannot print; None where no font is available"""
+    fonts = {"unicode": None, "unicode_bold": None, "telugu": None, "telugu_bold": None}
+    if embed_fonts:
+        fonts["unicode"] = register_font("unicode")
+        fonts["unicode_bold"] = register_font("unicode_bold") or fonts["unicode"]
+        if language == "te":
+            fonts["telugu"] = register_font("telugu")
+            fonts["telugu_bold"] = register_font("telugu_bold") or fonts["telugu"]
+    return fonts
+
+
+def available_languages():
+    """The LANGUAGES that have a font on this machine; English always does"""
+    return {name: code for name, code in LANGUAGES.items() if code == "en" or get_bill_fonts(code)["telugu"]}
+
+
+@functools.lru_cache(maxsize=None)
+def _warn_missing_font(language):
+    # Cached so a bulk run logs the fallback once per process, not once per bill
+    print(f"No font found for language {language!r} (set BILL_FONT_DIR); printing bills in English")
+
+
+def _helvetica_can_print(text):
+    try:
+        text.encode("cp1252")
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+class BillCanvas(canvas.Canvas):
+    """Canvas that falls back to embedded fonts for text Helvetica cannot print.
+
+    Text stays in Helvetica wherever WinAnsi can encode it, so English bills
+    only embed the few glyphs (such as ₹) that Helvetica lacks. Telugu runs
+    use the Telugu font and are shaped when uharfbuzz is installed.
+    """
+
+    def __init__(self, *args, fonts=None, **kwargs):
+        self.bill_fonts = fonts or get_bill_fonts()
+        super().__init__(*args, **kwargs)
+
+    def _runs(self, text):
+        """Split text into (run, font, shaping) pieces"""
+        bold = self._fontname.endswith("-Bold")
+        base_font = self._fontname
+        unicode_font = self.bill_fonts["unicode_bold" if bold else "unicode"]
+        telugu_font = self.bill_fonts["telugu_bold" if bold else "telugu"]
+        runs = []
+        position = 0
+        matches = TELUGU_RUN.finditer(text) if telugu_font else []
+        for match in list(matches) + [None]:
+            end = match.start() if match else len(text)
+            for char in text[position:end]:
+                font = base_font if _helvetica_can_print(char) or not unicode_font else unicode_font
+                if runs and runs[-1][1] == font:
+                    runs[-1][0] += char
+                else:
+                    runs.append([char, font, False])
+            if match:
+                runs.append([match.group(), telugu_font, SHAPING])
+                position = match.end()
+        return runs
+
+    def drawString(self, x, y, text, *args, **kwargs):
+        if not self.bill_fonts["unicode"]:
+            # Without an embedded font ₹ would print as a missing glyph
+            text = text.replace("₹", "Rs.")
+        if _helvetica_can_print(text):
+            return super().drawString(x, y, text, *args, **kwargs)
+
+        base_font, size = self._fontname, self._fontsize
+        for run, font, shaping in self._runs(text):
+            super().setFont(font, size)
+            if shaping:
+                super().drawString(x, y, run, shaping=True)
+                x += self._shaped_width(run, font, size)
+            else:
+                super().drawString(x, y, run)
+                x += pdfmetrics.stringWidth(run, font, size)
+        super().setFont(base_font, size)
+
+    @staticmethod
+    def _shaped_width(text, font, size):
+        from reportlab.pdfgen.textobject import bidiShapedText
+        return bidiShapedText(text, direction=None, fontName=font, fontSize=size, shaping=True)[1]
+
+
+def create_bill_pdf(data, logo_path=None, language="en", embed_fonts=True):
+    """Render a bill as PDF bytes, with the logo if a local logo file is given"""
+    fonts = get_bill_fonts(language, embed_fonts)
+    if language == "te" and not fonts["telugu"]:
+        _warn_missing_font(language)
+        language = "en"
+    labels = LABELS[language]
+    
+    # Create a PDF buffer
+    buffer = BytesIO()
+    
+    # Create the PDF
+    c = BillCanvas(buffer, pagesize=letter, fonts=fonts)
+    width, height = letter
+    
+    # Add logo
+    if logo_path and os.path.exists(logo_path):
+        try:
+            c.drawImage(logo_path, 40, height - 120, width=100, height=80)
+        except Exception as e:
+            print(f"Error adding logo to PDF: {e}")
+    
+    # Add header
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(150, height - 80, labels["title"])
+    
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(40, height - 140, labels["invoice_heading"])
+    
+    # Add date
+    c.setFont("Helvetica", 12)
+    c.drawString(40, height - 160, f"{labels['bill_date']}: {data['Bill_Date']}")
+    c.drawString(40, height - 180, f"{labels['due_date']}: {data['Due_Date']}")
+    invoice_no = data.get("Invoice_No") or f"AP-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+    c.drawString(40, height - 200, f"{labels['invoice_no']}: {invoice_no}")
+    
+    # Customer information
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(40, height - 240, labels["customer_heading"])
+    c.setFont("Helvetica", 12)
+    c.drawString(40, height - 260, f"{labels['customer_name']}: {data['Customer_Name']}")
+    c.drawString(40, height - 280, f"{labels['service_id']}: {data['Service_ID']}")
+    customer_type = labels["customer_types"].get(data['Customer_Type'], data['Customer_Type'])
+    c.drawString(40, height - 300, f"{labels['customer_type']}: {customer_type}")
+    
+    # Billing information
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(40, height - 340, labels["billing_heading"])
+    c.setFont("Helvetica", 12)
+    c.drawString(40, height - 360, f"{labels['previous_reading']}: {data['Previous_Reading']} kWh")
+    c.drawString(40, height - 380, f"{labels['current_reading']}: {data['Current_Reading']} kWh")
+    c.drawString(40, height - 400, f"{labels['units_consumed']}: {data['Units_Consumed']} kWh")
+    
+    y_position = 400
+    
+    if "Peak_Hour_Units" in data:
+        y_position += 20
+        c.drawString(40, height - y_position, f"{labels['peak_hour_units']}: {data['Peak_Hour_Units']} kWh")
+    
+    # Draw a line
+    y_position += 20
+    c.line(40, height - y_position, width - 40, height - y_position)
+    
+    # Bill summary
+    y_position += 40
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(40, height - y_position, labels["summary_heading"])
+    c.setFont("Helvetica", 12)
+    y_position += 20
+    c.drawString(40, height - y_position, f"{labels['net_bill']}: ₹{data['Net_Bill']}")
+    y_position += 20
+    c.drawString(40, height - y_position, f"{labels['service_charge']}: ₹{data['Service_Charge']}")
+    y_position += 20
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(40, height - y_position, f"{labels['total_bill']}: ₹{data['Total_Bill']}")
+    
+    # Late payment section
+    # y_position += 40
+    # c.setFont("Helvetica-Bold", 14)
+    # c.drawString(40, height - y_position, "Payment Information")
+    # c.setFont("Helvetica", 12)
+    # y_position += 20
+    # c.drawString(40, height - y_position, f"Payment Due Date: {data['Due_Date']}")
+    # y_position += 20
+    # c.drawString(40, height - y_position, f"Late Payment Fee (2%): ₹{data['Late_Fee']}")
+    # y_position += 20
+    # c.setFont("Helvetica-Bold", 12)
+    # c.drawString(40, height - y_position, f"Amount After Due Date: ₹{data['Amount_After_Due_Date']}")
+    
+    # Payment methods section
+    y_position += 40
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(40, height - y_position, labels["payment_heading"])
+    y_position += 20
+    c.setFont("Helvetica", 12)
+    c.drawString(40, height - y_position, labels["pay_online"])
+    y_position += 20
+    c.drawString(40, height - y_position, labels["pay_app"])
+    y_position += 20
+    c.drawString(40, height - y_position, labels["pay_office"])
+    
+    # Footer
+    c.setFont("Helvetica", 10)
+    c.drawString(width/2 - 100, 50, labels["footer"])
+    c.drawString(width/2 - 100, 30, labels["footer_note"])
+    
+    # Save the PDF
+    c.showPage()
+    c.save()
+    
+    return buffer.getvalue()
@@ -0,0 +1,497 @@
+import datetime
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DB_PATH = os.environ.get("BILL_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bill_ledger.db"))
+
+# Units histogram buckets double in width (0-25, 25-50, 50-100, 100-200, ... kWh), so the
+# domestic slabs and large industrial meters both get readable buckets; the last bucket
+# collects everything above its start
+HISTOGRAM_BUCKETS = 16
+HISTOGRAM_STARTS = [0] + [25 * 2 ** b for b in range(HISTOGRAM_BUCKETS - 1)]
+
+# Reminders scheduled for every bill, as (kind, days relative to the due date)
+REMINDER_OFFSETS = [("due_soon", -7), ("due_today", 0), ("overdue", 1)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    invoice_no TEXT NOT NULL,
+    service_id TEXT NOT NULL,
+    customer_name TEXT,
+    customer_type TEXT NOT NULL,
+    bill_date TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    month TEXT NOT NULL,
+    previous_reading REAL,
+    current_reading REAL,
+    peak_hour_units REAL,
+    units_consumed REAL NOT NULL,
+    net_bill REAL NOT NULL,
+    service_charge REAL NOT NULL,
+    total_bill REAL NOT NULL,
+    late_fee REAL NOT NULL,
+    amount_after_due_date REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    run_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_bills_invoice ON bills (invoice_no);
+CREATE INDEX IF NOT EXISTS idx_bills_service ON bills (service_id, bill_date);
+
+CREATE TABLE IF NOT EXISTS monthly_service_totals (
+    service_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    bill_count INTEGER NOT NULL,
+    units REAL NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (service_id, month)
+);
+
+CREATE TABLE IF NOT EXISTS monthly_category_totals (
+    customer_type TEXT NOT NULL,
+    month TEXT NOT NULL,
+    bill_count INTEGER NOT NULL,
+    units REAL NOT NULL,
+    net_bill REAL NOT NULL,
+    service_charge REAL NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (customer_type, month)
+);
+
+CREATE TABLE IF NOT EXISTS units_log_histogram (
+    customer_type TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    bill_count INTEGER NOT NULL,
+    PRIMARY KEY (customer_type, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS due_date_totals (
+    due_date TEXT NOT NULL,
+    customer_type TEXT NOT NULL,
+    bill_count INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    paid_amount REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (due_date, customer_type)
+);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bill_id INTEGER REFERENCES bills (id),
+    service_id TEXT NOT NULL,
+    invoice_no TEXT,
+    payment_date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    reference TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    credited REAL,
+    run_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_payments_bill ON payments (bill_id);
+CREATE INDEX IF NOT EXISTS idx_payments_reference ON payments (service_id, reference);
+
+CREATE TABLE IF NOT EXISTS bill_payments (
+    bill_id INTEGER PRIMARY KEY REFERENCES bills (id),
+    paid_amount REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bill_id INTEGER NOT NULL REFERENCES bills (id),
+    kind TEXT NOT NULL,
+    remind_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    processed_at TEXT,
+    UNIQUE (bill_id, kind)
+);
+-- Only pending reminders are indexed, so popping due ones never touches sent history
+CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (remind_at) WHERE status = 'pending';
+"""
+
+# Ledgers created before runs could be reversed lack these (table, column, type); added on open
+ADDED_COLUMNS = [("bills", "run_id", "TEXT"), ("payments", "credited", "REAL"), ("payments", "run_id", "TEXT")]
+
+# Indexes on added columns, created once the columns exist
+RUN_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_bills_run ON bills (run_id) WHERE run_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_payments_run ON payments (run_id) WHERE run_id IS NOT NULL;
+"""
+
+# Recomputes the units histogram from the bills, with the same buckets as _add_aggregates
+HISTOGRAM_REBUILD = f"""
+DELETE FROM units_log_histogram;
+INSERT INTO units_log_histogram
+    SELECT customer_type, CASE {" ".join(f"WHEN units_consumed < {start} THEN {b - 1}" for b, start in enumerate(HISTOGRAM_STARTS) if b)}
+        ELSE {HISTOGRAM_BUCKETS - 1} END AS bucket, COUNT(*)
+    FROM bills GROUP BY customer_type, bucket;
+"""
+
+BILL_COLUMNS = [
+    "invoice_no", "service_id", "customer_name", "customer_type", "bill_date", "due_date", "month",
+    "previous_reading", "current_reading", "peak_hour_units", "units_consumed", "net_bill",
+    "service_charge", "total_bill", "late_fee", "amount_after_due_date", "created_at"
+]
+
+
+class BillStore:
+    """SQLite bill ledger with incrementally maintained aggregates.
+
+    Every bill written through add_bill/add_bills also updates the monthly,
+    histogram and due-date aggregate tables in the same transaction, so the
+    dashboards only ever read the small aggregate tables.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            add_missing_columns(conn, ADDED_COLUMNS)
+            conn.executescript(RUN_INDEXES)
+            # units_histogram held fixed 50 kWh buckets; its replacement is filled from the bills once
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'units_histogram'").fetchone():
+                conn.executescript("DROP TABLE units_histogram;" + HISTOGRAM_REBUILD)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_bill(self, bill):
+        """Write one bill (a dict with BILL_COLUMNS keys) and update the aggregates"""
+        self.add_bills(pd.DataFrame([bill]))
+
+    def add_bills(self, bills, run_id=None):
+        """Write a DataFrame of bills and update the aggregates in one transaction.
+
+        Bills written with a run_id can be taken back out with reverse_run.
+        """
+        if bills.empty:
+            return
+        bills = bills.copy()
+        bills["service_id"] = bills["service_id"].map(normalize_service_id)
+        bills["customer_type"] = bills["customer_type"].str.strip().str.title()
+        bills["month"] = bills["bill_date"].str[:7]
+        if "created_at" not in bills:
+            bills["created_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        for column in ["customer_name", "previous_reading", "current_reading", "peak_hour_units"]:
+            if column not in bills:
+                bills[column] = None
+        bills = bills[BILL_COLUMNS].assign(run_id=run_id)
+
+        columns = BILL_COLUMNS + ["run_id"]
+        with self.connect() as conn:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bills").fetchone()[0]
+            conn.executemany(
+                f"INSERT INTO bills ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                _rows(bills)
+            )
+            self._schedule_reminders(conn, last_id)
+            self._add_aggregates(conn, bills)
+
+    def _add_aggregates(self, conn, bills, sign=1):
+        """Add a batch of bills to the aggregate tables, or take them out with sign=-1"""
+        # Pre-aggregate the batch so each aggregate row is touched once
+        service_totals = bills.groupby(["service_id", "month"], as_index=False).agg(
+            bill_count=("total_bill", "size"), units=("units_consumed", "sum"), amount=("total_bill", "sum"))
+        category_totals = bills.groupby(["customer_type", "month"], as_index=False).agg(
+            bill_count=("total_bill", "size"), units=("units_consumed", "sum"),
+            net_bill=("net_bill", "sum"), service_charge=("service_charge", "sum"), amount=("total_bill", "sum"))
+        buckets = np.searchsorted(HISTOGRAM_STARTS, bills["units_consumed"].clip(lower=0), side="right") - 1
+        histogram = bills.assign(bucket=buckets).groupby(["customer_type", "bucket"], as_index=False).agg(
+            bill_count=("total_bill", "size"))
+        due_totals = bills.groupby(["due_date", "customer_type"], as_index=False).agg(
+            bill_count=("total_bill", "size"), amount=("total_bill", "sum"))
+        if sign != 1:
+            for frame in [service_totals, category_totals, histogram, due_totals]:
+                # Each frame is two key columns followed by its measures
+                frame.iloc[:, 2:] *= sign
+
+        conn.executemany("""
+            INSERT INTO monthly_service_totals (service_id, month, bill_count, units, amount)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (service_id, month) DO UPDATE SET
+                bill_count = bill_count + excluded.bill_count,
+                units = units + excluded.units,
+                amount = amount + excluded.amount
+        """, _rows(service_totals))
+        conn.executemany("""
+            INSERT INTO monthly_category_totals (customer_type, month, bill_count, units, net_bill, service_charge, amount)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (customer_type, month) DO UPDATE SET
+                bill_count = bill_count + excluded.bill_count,
+                units = units + excluded.units,
+                net_bill = net_bill + excluded.net_bill,
+                service_charge = service_charge + excluded.service_charge,
+                amount = amount + excluded.amount
+        """, _rows(category_totals))
+        conn.executemany("""
+            INSERT INTO units_log_histogram (customer_type, bucket, bill_count)
+            VALUES (?, ?, ?)
+            ON CONFLICT (customer_type, bucket) DO UPDATE SET
+                bill_count = bill_count + excluded.bill_count
+        """, _rows(histogram))
+        conn.executemany("""
+            INSERT INTO due_date_totals (due_date, customer_type, bill_count, amount)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (due_date, customer_type) DO UPDATE SET
+                bill_count = bill_count + excluded.bill_count,
+                amount = amount + excluded.amount
+        """, _rows(due_totals))
+        if sign < 0:
+            # Drop groups the removed bills emptied, as if they had never been written
+            for table in ["monthly_service_totals", "monthly_category_totals", "units_log_histogram", "due_date_totals"]:
+                conn.execute(f"DELETE FROM {table} WHERE bill_count <= 0")
+
+    def _schedule_reminders(self, conn, after_bill_id):
+        for kind, days in REMINDER_OFFSETS:
+            conn.execute("""
+                INSERT OR IGNORE INTO reminders (bill_id, kind, remind_at)
+                SELECT id, ?, date(due_date, ?) FROM bills WHERE id > ?
+            """, (kind, f"{days:+d} days", after_bill_id))
+
+    def backfill_reminders(self):
+        """Schedule reminders for bills written before reminders existed"""
+        with self.connect() as conn:
+            self._schedule_reminders(conn, 0)
+
+    def pop_due_reminders(self, as_of, limit=1000):
+        """Pending reminders due on or before as_of, oldest first, with their bills"""
+        with self.connect() as conn:
+            return [dict(row) for row in conn.execute("""
+                SELECT r.id AS reminder_id, r.kind, r.remind_at, b.id AS bill_id, b.invoice_no, b.service_id,
+                    b.customer_name, b.customer_type, b.bill_date, b.due_date, b.total_bill, b.late_fee,
+                    b.amount_after_due_date, COALESCE(p.paid_amount, 0) AS paid_amount
+                FROM reminders r
+                JOIN bills b ON b.id = r.bill_id
+                LEFT JOIN bill_payments p ON p.bill_id = b.id
+                WHERE r.status = 'pending' AND r.remind_at <= ?
+                ORDER BY r.remind_at, r.id
+                LIMIT ?
+            """, (as_of, limit))]
+
+    def mark_reminders(self, reminder_ids, status):
+        """Mark reminders as sent or skipped so they are not popped again"""
+        processed_at = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.connect() as conn:
+            conn.executemany(
+                "UPDATE reminders SET status = ?, processed_at = ? WHERE id = ?",
+                ((status, processed_at, reminder_id) for reminder_id in reminder_ids)
+            )
+
+    def rebuild_aggregates(self):
+        """Recompute every aggregate table from the bills table (repair only)"""
+        with self.connect() as conn:
+            conn.executescript(f"""
+                DELETE FROM monthly_service_totals;
+                INSERT INTO monthly_service_totals
+                    SELECT service_id, month, COUNT(*), SUM(units_consumed), SUM(total_bill)
+                    FROM bills GROUP BY service_id, month;
+                DELETE FROM monthly_category_totals;
+                INSERT INTO monthly_category_totals
+                    SELECT customer_type, month, COUNT(*), SUM(units_consumed), SUM(net_bill), SUM(service_charge), SUM(total_bill)
+                    FROM bills GROUP BY customer_type, month;
+                {HISTOGRAM_REBUILD}
+                DELETE FROM due_date_totals;
+                INSERT INTO due_date_totals
+                    SELECT b.due_date, b.customer_type, COUNT(*), SUM(b.total_bill),
+                        SUM(MIN(COALESCE(p.paid_amount, 0), b.total_bill))
+                    FROM bills b LEFT JOIN bill_payments p ON p.bill_id = b.id
+                    GROUP BY b.due_date, b.customer_type;
+            """)
+
+    def bills_for_services(self, service_ids):
+        """Bills of the given services with the amount already paid on each"""
+        with self.connect() as conn:
+            # Join through a temp table so the lookup uses the service_id index
+            conn.execute("CREATE TEMP TABLE lookup_services (service_id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO lookup_services VALUES (?)", ((normalize_service_id(s),) for s in service_ids))
+            return pd.read_sql_query("""
+                SELECT b.id AS bill_id, b.invoice_no, b.service_id, b.customer_type, b.bill_date, b.due_date,
+                    b.total_bill, b.amount_after_due_date, COALESCE(p.paid_amount, 0) AS paid_amount
+                FROM lookup_services l
+                JOIN bills b ON b.service_id = l.service_id
+                LEFT JOIN bill_payments p ON p.bill_id = b.id
+            """, conn)
+
+    def known_references(self, keys):
+        """The (service_id, reference) pairs among keys that already have a recorded payment"""
+        if not keys:
+            return set()
+        with self.connect() as conn:
+            conn.execute("CREATE TEMP TABLE lookup_references (service_id TEXT, reference TEXT, PRIMARY KEY (service_id, reference))")
+            conn.executemany("INSERT OR IGNORE INTO lookup_references VALUES (?, ?)",
+                             ((normalize_service_id(s), reference) for s, reference in keys))
+            return {tuple(row) for row in conn.execute("""
+                SELECT DISTINCT l.service_id, l.reference
+                FROM lookup_references l
+                JOIN payments p ON p.service_id = l.service_id AND p.reference = l.reference
+            """)}
+
+    def last_bill(self, service_id):
+        """Most recent bill of a service as a dict, or None if it has never been billed"""
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM bills WHERE service_id = ? ORDER BY bill_date DESC, id DESC LIMIT 1",
+                (normalize_service_id(service_id),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def add_payments(self, payments, run_id=None):
+        """Record reconciled payments and credit them to their bills and due-date totals.
+
+        payments needs bill_id (None when unmatched), service_id, invoice_no,
+        payment_date, amount, reference and status columns, plus due_date,
+        customer_type and credited (amount counted against total_bill) for
+        matched rows. Payments written with a run_id can be taken back out
+        with reverse_run.
+        """
+        if payments.empty:
+            return
+        payments = payments.copy()
+        payments["service_id"] = payments["service_id"].map(normalize_service_id)
+        payments["created_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        payments["run_id"] = run_id
+        columns = [
+            "bill_id", "service_id", "invoice_no", "payment_date", "amount", "reference", "status", "created_at",
+            "credited", "run_id"
+        ]
+        matched = payments[payments["bill_id"].notna()]
+        bill_totals = matched.groupby("bill_id", as_index=False)["amount"].sum()
+        due_totals = matched.groupby(["due_date", "customer_type"], as_index=False)["credited"].sum()
+
+        with self.connect() as conn:
+            conn.executemany(
+                f"INSERT INTO payments ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                _rows(payments[columns])
+            )
+            conn.executemany("""
+                INSERT INTO bill_payments (bill_id, paid_amount) VALUES (?, ?)
+                ON CONFLICT (bill_id) DO UPDATE SET paid_amount = paid_amount + excluded.paid_amount
+            """, _rows(bill_totals.astype({"bill_id": int})))
+            conn.executemany("""
+                UPDATE due_date_totals SET paid_amount = paid_amount + ?
+                WHERE due_date = ? AND customer_type = ?
+            """, _rows(due_totals[["credited", "due_date", "customer_type"]]))
+
+    def reverse_run(self, run_id):
+        """Remove every bill and payment written under run_id, with its aggregates and reminders.
+
+        Used when a job is cancelled or fails, so the ledger is left as if it
+        never ran. Payments from other runs to the removed bills become
+        unmatched. Returns (bills removed, payments removed).
+        """
+        with self.connect() as conn:
+            bills = pd.read_sql_query("SELECT * FROM bills WHERE run_id = ?", conn, params=(run_id,))
+            conn.execute("CREATE TEMP TABLE run_bills (id INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT INTO run_bills VALUES (?)", ((int(i),) for i in bills["id"]))
+
+            # Take back what the run's payments, and any payments to the run's bills, credited
+            credits = pd.read_sql_query("""
+                SELECT p.bill_id, p.amount, COALESCE(p.credited, 0) AS credited, b.due_date, b.customer_type
+                FROM payments p JOIN bills b ON b.id = p.bill_id
+                WHERE p.run_id = ?
+                UNION ALL
+                SELECT p.bill_id, p.amount, COALESCE(p.credited, 0), b.due_date, b.customer_type
+                FROM run_bills r JOIN payments p ON p.bill_id = r.id JOIN bills b ON b.id = r.id
+                WHERE p.run_id IS NOT ?
+            """, conn, params=(run_id, run_id))
+            conn.executemany(
+                "UPDATE bill_payments SET paid_amount = paid_amount - ? WHERE bill_id = ?",
+                _rows(credits.groupby("bill_id", as_index=False)["amount"].sum()[["amount", "bill_id"]])
+            )
+            conn.executemany(
+                "UPDATE due_date_totals SET paid_amount = paid_amount - ? WHERE due_date = ? AND customer_type = ?",
+                _rows(credits.groupby(["due_date", "customer_type"], as_index=False)["credited"].sum()
+                      [["credited", "due_date", "customer_type"]])
+            )
+            payments_removed = conn.execute("DELETE FROM payments WHERE run_id = ?", (run_id,)).rowcount
+            conn.execute("""
+                UPDATE payments SET bill_id = NULL, status = 'unmatched', credited = NULL
+                WHERE bill_id IN (SELECT id FROM run_bills)
+            """)
+            # Bills with no payments left go back to having no bill_payments row
+            conn.executemany("""
+                DELETE FROM bill_payments
+                WHERE bill_id = ? AND NOT EXISTS (SELECT 1 FROM payments WHERE bill_id = bill_payments.bill_id)
+            """, ((int(bill_id),) for bill_id in credits["bill_id"].unique()))
+
+            conn.execute("DELETE FROM bill_payments WHERE bill_id IN (SELECT id FROM run_bills)")
+            conn.execute("DELETE FROM reminders WHERE bill_id IN (SELECT id FROM run_bills)")
+            conn.execute("DELETE FROM bills WHERE id IN (SELECT id FROM run_bills)")
+            if not bills.empty:
+                self._add_aggregates(conn, bills, sign=-1)
+        return len(bills), payments_removed
+
+    def recent_services(self, limit=50, scan=1000):
+        """Service IDs of the latest bills, newest first, looking at no more than scan bills"""
+        with self.connect() as conn:
+            rows = conn.execute("SELECT service_id FROM bills ORDER BY id DESC LIMIT ?", (scan,)).fetchall()
+        return list(dict.fromkeys(row[0] for row in rows))[:limit]
+
+    def service_bills(self, service_id, limit=24):
+        """Latest bills of one service with the amount paid on each, newest first"""
+        with self.connect() as conn:
+            return pd.read_sql_query("""
+                SELECT b.invoice_no, b.customer_name, b.bill_date, b.due_date, b.units_consumed, b.total_bill,
+                    COALESCE(p.paid_amount, 0) AS paid_amount
+                FROM bills b LEFT JOIN bill_payments p ON p.bill_id = b.id
+                WHERE b.service_id = ?
+                ORDER BY b.bill_date DESC, b.id DESC
+                LIMIT ?
+            """, conn, params=(normalize_service_id(service_id), limit))
+
+    def service_monthly(self, service_id):
+        """Monthly consumption and amount for one service, oldest first"""
+        with self.connect() as conn:
+            return pd.read_sql_query(
+                "SELECT month, bill_count, units, amount FROM monthly_service_totals "
+                "WHERE service_id = ? ORDER BY month", conn, params=(normalize_service_id(service_id),))
+
+    def category_monthly(self):
+        """Monthly totals per customer type, oldest first"""
+        with self.connect() as conn:
+            return pd.read_sql_query(
+                "SELECT customer_type, month, bill_count, units, net_bill, service_charge, amount "
+                "FROM monthly_category_totals ORDER BY month, customer_type", conn)
+
+    def units_histogram(self):
+        """Bill counts per units bucket and customer type"""
+        with self.connect() as conn:
+            histogram = pd.read_sql_query(
+                "SELECT customer_type, bucket, bill_count FROM units_log_histogram ORDER BY bucket", conn)
+        histogram["units_range"] = [
+            f"{HISTOGRAM_STARTS[b]}+" if b == HISTOGRAM_BUCKETS - 1 else f"{HISTOGRAM_STARTS[b]}-{HISTOGRAM_STARTS[b + 1]}"
+            for b in histogram["bucket"]
+        ]
+        return histogram
+
+    def overdue_totals(self, as_of=None):
+        """Unpaid amount per customer type for bills due before as_of (default today)"""
+        as_of = as_of or datetime.date.today().strftime("%Y-%m-%d")
+        with self.connect() as conn:
+            return pd.read_sql_query(
+                "SELECT customer_type, SUM(bill_count) AS bill_count, SUM(amount - paid_amount) AS overdue_amount "
+                "FROM due_date_totals WHERE due_date < ? GROUP BY customer_type ORDER BY customer_type",
+                conn, params=(as_of,))
+
+
+def normalize_service_id(service_id):
+    """Service ID as the customer master stores it, so ledger lookups find master customers"""
+    return str(service_id).strip().upper()
+
+
+def add_missing_columns(conn, columns):
+    """Add (table, column, type) columns that an older database was created without"""
+    for table, column, column_type in columns:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def _rows(frame):
+    # Plain Python values for sqlite3 (it cannot bind numpy scalars or NaN as NULL)
+    return frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
@@ -0,0 +1,252 @@
+import contextlib
+import datetime
+import os
+import secrets
+import shutil
+import tempfile
+import zipfile
+
+import pandas as pd
+
+from bill_calculator import BillCalculator
+from bill_pdf import create_bill_pdf
+
+# Columns expected in an uploaded readings file
+REQUIRED_COLUMNS = ["Service_ID", "Customer_Name", "Customer_Type", "Bill_Date", "Current_Reading", "Previous_Reading"]
+OPTIONAL_COLUMNS = ["Peak_Hour_Units"]
+
+# Columns written to the results file, in bill_data naming
+RESULT_COLUMNS = [
+    "Invoice_No", "Service_ID", "Customer_Name", "Customer_Type", "Bill_Date", "Due_Date",
+    "Previous_Reading", "Current_Reading", "Peak_Hour_Units", "Units_Consumed", "Net_Bill",
+    "Service_Charge", "Total_Bill", "Late_Fee", "Amount_After_Due_Date", "Status"
+]
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# PDF generation reports progress every this many rows
+PDF_PROGRESS_ROWS = 500
+
+
+def sample_readings_csv():
+    """Template readings file offered for download on the Bulk Billing page"""
+    sample = pd.DataFrame([
+        ["SVC0001", "Ravi Kumar", "Domestic", "2025-04-01", 1350.0, 1120.0, 0],
+        ["SVC0002", "Sri Lakshmi Stores", "Commercial", "2025-04-01", 8420.5, 7990.0, 0],
+        ["SVC0003", "Tirupati Mills", "Industrial", "2025-04-01", 56210.0, 52100.0, 900.0],
+    ], columns=REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    return sample.to_csv(index=False)
+
+
+def new_invoice_prefix():
+    """Invoice number prefix for one billing run or single bill.
+
+    The random part keeps the invoice numbers of runs started in the same
+    second apart, so an invoice number names exactly one ledger bill.
+    """
+    stamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    return f"AP-{stamp}-{secrets.token_hex(3).upper()}"
+
+
+def count_rows(file, filename):
+    """Number of data rows in an uploaded file, without loading it into pandas"""
+    file.seek(0)
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True)
+        rows = max((workbook.active.max_row or 1) - 1, 0)
+        workbook.close()
+    else:
+        newlines = 0
+        last = b"\n"
+        for block in iter(lambda: file.read(1 << 20), b""):
+            newlines += block.count(b"\n")
+            last = block[-1:]
+        rows = max(newlines - 1 + (last != b"\n"), 0)
+    file.seek(0)
+    return rows
+
+
+def iter_reading_chunks(file, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size readings from a CSV or Excel file"""
+    file.seek(0)
+    if filename.lower().endswith(".xlsx"):
+        # openpyxl's read-only mode streams rows instead of loading the sheet
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+        batch = []
+        for row in rows:
+            if not any(value is not None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+        workbook.close()
+    else:
+        for chunk in pd.read_csv(file, chunksize=chunk_size, dtype={"Service_ID": str}):
+            chunk.columns = [str(c).strip() for c in chunk.columns]
+            yield chunk
+
+
+@contextlib.contextmanager
+def replace_when_done(path):
+    """Yield a path to write instead of path, moved over it only if the block finishes.
+
+    A run that fails or is cancelled midway never leaves a half-written file
+    where a download link would find it.
+    """
+    partial_path = path + ".part"
+    try:
+        yield partial_path
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.replace(partial_path, path)
+
+
+class BulkBillingRun:
+    """Bills a readings file chunk by chunk, keeping results on disk.
+
+    Only one chunk is held in memory at a time. Results go to a CSV file in a
+    private work directory, with the byte offset of every chunk recorded so a
+    page of results can be read back without scanning the whole file.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, work_dir=None):
+        self.chunk_size = chunk_size
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="bulk_billing_")
+        self.results_path = os.path.join(self.work_dir, "bill_results.csv")
+        self.pdf_zip_path = os.path.join(self.work_dir, "bill_pdfs.zip")
+        self.bill_calculator = BillCalculator()
+        self.invoice_prefix = new_invoice_prefix()
+        self.chunk_offsets = []  # (byte offset, first row number, row count)
+        self.total_rows = 0
+        self.billed_rows = 0
+        self.error_rows = 0
+        self.total_amount = 0.0
+        self.total_units = 0.0
+
+    def state(self):
+        """Counters and chunk offsets of a finished run as plain data, for from_state to page its results"""
+        return {
+            "chunk_size": self.chunk_size, "work_dir": self.work_dir, "chunk_offsets": self.chunk_offsets,
+            "total_rows": self.total_rows, "billed_rows": self.billed_rows, "error_rows": self.error_rows,
+            "total_amount": self.total_amount, "total_units": self.total_units,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        run = cls(state["chunk_size"], state["work_dir"])
+        for name in ["total_rows", "billed_rows", "error_rows", "total_amount", "total_units"]:
+            setattr(run, name, state[name])
+        run.chunk_offsets = [tuple(c) for c in state["chunk_offsets"]]
+        return run
+
+    def bill_chunk(self, readings, first_row):
+        """Calculate bills for one chunk of readings and return result rows"""
+        missing = [c for c in REQUIRED_COLUMNS if c not in readings.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        readings = readings.reset_index(drop=True)
+        if "Peak_Hour_Units" not in readings:
+            readings["Peak_Hour_Units"] = 0.0
+        # Only industrial customers are billed for peak hours, as on the Calculate Bill page
+        is_industrial = readings["Customer_Type"].astype(str).str.strip().str.lower() == "industrial"
+        readings["Peak_Hour_Units"] = pd.to_numeric(readings["Peak_Hour_Units"], errors="coerce").fillna(0).where(is_industrial, 0.0)
+
+        result = self.bill_calculator.calculate_bills(readings)
+
+        row_numbers = pd.RangeIndex(first_row + 1, first_row + len(readings) + 1).astype(str)
+        return pd.DataFrame({
+            "Invoice_No": f"{self.invoice_prefix}-" + row_numbers.str.zfill(6),
+            "Service_ID": readings["Service_ID"].astype(str),
+            "Customer_Name": readings["Customer_Name"],
+            "Customer_Type": readings["Customer_Type"],
+            "Bill_Date": result["bill_date"].fillna(readings["Bill_Date"].astype(str)),
+            "Due_Date": result["due_date"],
+            "Previous_Reading": readings["Previous_Reading"],
+            "Current_Reading": readings["Current_Reading"],
+            "Peak_Hour_Units": readings["Peak_Hour_Units"],
+            "Units_Consumed": result["units_consumed"],
+            "Net_Bill": result["net_bill"],
+            "Service_Charge": result["service_charge"],
+            "Total_Bill": result["total_bill"],
+            "Late_Fee": result["late_fee"],
+            "Amount_After_Due_Date": result["amount_after_due_date"],
+            "Status": result["error"].fillna("OK")
+        }, columns=RESULT_COLUMNS)
+
+    def process(self, file, filename, progress_callback=None, bill_store=None, run_id=None):
+        """Bill every reading in the file, reporting (rows done, total rows).
+
+        Successfully billed rows are also written to bill_store, if given,
+        tagged with run_id so an unfinished run can be reversed.
+        """
+        expected_rows = count_rows(file, filename)
+        with open(self.results_path, "w", newline="", encoding="utf-8") as out:
+            out.write(",".join(RESULT_COLUMNS) + "\n")
+            for readings in iter_reading_chunks(file, filename, self.chunk_size):
+                bills = self.bill_chunk(readings, self.total_rows)
+                self.chunk_offsets.append((out.tell(), self.total_rows, len(bills)))
+                bills.to_csv(out, header=False, index=False)
+
+                ok = bills["Status"] == "OK"
+                if bill_store is not None:
+                    bill_store.add_bills(bills[ok].drop(columns="Status").rename(columns=str.lower), run_id)
+                self.total_rows += len(bills)
+                self.billed_rows += int(ok.sum())
+                self.error_rows += int((~ok).sum())
+                self.total_amount += float(bills.loc[ok, "Total_Bill"].sum())
+                self.total_units += float(bills.loc[ok, "Units_Consumed"].sum())
+                if progress_callback:
+                    progress_callback(self.total_rows, max(expected_rows, self.total_rows))
+        return self
+
+    def read_page(self, page, page_size):
+        """Read one page (0-based) of results back from disk"""
+        start = page * page_size
+        if start >= self.total_rows:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        # Find the chunk containing the first row of the page and seek to it
+        offset, first_row, _ = next(
+            c for c in reversed(self.chunk_offsets) if c[1] <= start
+        )
+        with open(self.results_path, "r", newline="", encoding="utf-8") as f:
+            f.seek(offset)
+            return pd.read_csv(
+                f, header=None, names=RESULT_COLUMNS, skiprows=start - first_row,
+                nrows=page_size, dtype={"Service_ID": str, "Invoice_No": str}
+            )
+
+    def iter_results(self):
+        """Yield the results file back chunk by chunk"""
+        yield from pd.read_csv(
+            self.results_path, chunksize=self.chunk_size, dtype={"Service_ID": str, "Invoice_No": str}
+        )
+
+    def build_pdf_zip(self, logo_path=None, progress_callback=None, language="en"):
+        """Write a PDF bill for every billed row into a ZIP file on disk"""
+        done = 0
+        with replace_when_done(self.pdf_zip_path) as partial_path:
+            with zipfile.ZipFile(partial_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for bills in self.iter_results():
+                    for bill in bills.to_dict("records"):
+                        done += 1
+                        if bill["Status"] == "OK":
+                            if bill["Customer_Type"].strip().lower() != "industrial":
+                                del bill["Peak_Hour_Units"]
+                            archive.writestr(f"{bill['Invoice_No']}.pdf", create_bill_pdf(bill, logo_path, language))
+                        if progress_callback and done % PDF_PROGRESS_ROWS == 0:
+                            progress_callback(done, self.total_rows)
+                if progress_callback:
+                    progress_callback(done, self.total_rows)
+        return self.pdf_zip_path
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
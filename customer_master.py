@@ -0,0 +1,198 @@
+"""Customer master with prefix search for service ID and name autocomplete.
+
+The master is read from a CSV or Excel file with Service_ID, Customer_Name
+and Customer_Type columns. Search keys are kept in sorted byte arrays, so a
+prefix lookup is two binary searches regardless of the number of customers.
+The built index is saved next to the master file and reused until the
+master changes.
+
+Usage:
+    python customer_master.py customer_master.csv --search "SVC00012"
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_billing import iter_reading_chunks
+
+DEFAULT_MASTER_PATH = os.environ.get(
+    "CUSTOMER_MASTER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "customer_master.csv")
+)
+
+REQUIRED_COLUMNS = ["Service_ID", "Customer_Name", "Customer_Type"]
+
+# Search keys are cut to this many bytes; longer queries are checked against the full value
+KEY_BYTES = 32
+
+# UTF-8 never contains this byte, so prefix + KEY_END sorts after every key starting with prefix
+KEY_END = b"\xff"
+
+
+def _encode(values):
+    # UTF-8 byte strings sort in code point order and take a byte per ASCII character
+    return np.array(pd.Series(values, dtype=object).str.encode("utf-8").to_numpy(), dtype="S")
+
+
+def _name_keys(names):
+    """Every word-start suffix of each name, so "lakshmi" finds "Sri Lakshmi Stores"."""
+    keys, positions = [], []
+    for position, name in enumerate(names):
+        words = name.lower().split()
+        for i in range(len(words)):
+            keys.append(" ".join(words[i:]))
+            positions.append(position)
+    return keys, positions
+
+
+class PrefixIndex:
+    """Sorted search keys with the master row each key belongs to"""
+
+    def __init__(self, keys, positions):
+        self.keys = keys
+        self.positions = positions
+
+    @classmethod
+    def build(cls, keys, positions):
+        keys = _encode(keys)
+        if keys.dtype.itemsize > KEY_BYTES:
+            keys = keys.astype(f"S{KEY_BYTES}")
+        order = np.argsort(keys, kind="stable")
+        return cls(keys[order], np.asarray(positions, dtype=np.int32)[order])
+
+    def search(self, prefix):
+        """Row positions of every key starting with prefix, in key order"""
+        prefix = prefix.encode("utf-8")[:KEY_BYTES]
+        start = np.searchsorted(self.keys, prefix, "left")
+        stop = np.searchsorted(self.keys, prefix + KEY_END, "left")
+        return self.positions[start:stop]
+
+
+class CustomerMaster:
+    """In-memory customer master with prefix indexes on service ID and name"""
+
+    def __init__(self, service_ids, names, types, id_index, name_index):
+        self.service_ids = service_ids
+        self.names = names
+        self.types = types
+        self.id_index = id_index
+        self.name_index = name_index
+
+    @classmethod
+    def from_frame(cls, customers):
+        missing = [c for c in REQUIRED_COLUMNS if c not in customers.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        customers = customers.drop_duplicates("Service_ID", keep="last")
+        service_ids = customers["Service_ID"].astype(str).str.strip().str.upper().to_numpy()
+        names = customers["Customer_Name"].fillna("").astype(str).str.strip().to_numpy()
+        types = customers["Customer_Type"].astype(str).str.strip().str.title().to_numpy()
+        return cls(
+            _encode(service_ids), _encode(names), _encode(types),
+            PrefixIndex.build(service_ids, np.arange(len(service_ids))),
+            PrefixIndex.build(*_name_keys(names)),
+        )
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_MASTER_PATH, chunk_size=100000):
+        """Load the master, reusing the saved index if it is newer than the file"""
+        index_path = path + ".index.npz"
+        if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(path):
+            return cls.load_index(index_path)
+        with open(path, "rb") as f:
+            customers = pd.concat(
+                chunk[[c for c in chunk.columns if c in REQUIRED_COLUMNS]]
+                for chunk in iter_reading_chunks(f, path, chunk_size)
+            )
+        master = cls.from_frame(customers)
+        try:
+            master.save_index(index_path)
+        except OSError as e:
+            print(f"Error saving customer index: {e}")
+        return master
+
+    def save_index(self, index_path):
+        with open(index_path, "wb") as f:
+            np.savez(
+                f, service_ids=self.service_ids, names=self.names, types=self.types,
+                id_keys=self.id_index.keys, id_positions=self.id_index.positions,
+                name_keys=self.name_index.keys, name_positions=self.name_index.positions,
+            )
+
+    @classmethod
+    def load_index(cls, index_path):
+        data = np.load(index_path)
+        return cls(
+            data["service_ids"], data["names"], data["types"],
+            PrefixIndex(data["id_keys"], data["id_positions"]),
+            PrefixIndex(data["name_keys"], data["name_positions"]),
+        )
+
+    def __len__(self):
+        return len(self.service_ids)
+
+    def customer(self, position):
+        return {
+            "service_id": self.service_ids[position].decode("utf-8"),
+            "customer_name": self.names[position].decode("utf-8"),
+            "customer_type": self.types[position].decode("utf-8"),
+        }
+
+    def search(self, query, limit=20):
+        """Customers whose service ID or any word of the name starts with query.
+
+        Service ID matches come first, then name matches, each in sorted order.
+        """
+        query = " ".join(query.split())
+        if not query:
+            return []
+        # Keys are cut to KEY_BYTES, so longer queries are confirmed on the full value
+        confirm = len(query.encode("utf-8")) > KEY_BYTES
+        results, seen = [], set()
+        searches = [
+            (self.id_index, query.upper(), lambda c, q: c["service_id"].startswith(q)),
+            (self.name_index, query.lower(), lambda c, q: f" {q}" in " " + " ".join(c["customer_name"].lower().split())),
+        ]
+        for index, prefix, matches in searches:
+            for position in index.search(prefix):
+                if position in seen:
+                    continue
+                customer = self.customer(position)
+                if confirm and not matches(customer, prefix):
+                    continue
+                seen.add(position)
+                results.append(customer)
+                if len(results) == limit:
+                    return results
+        return results
+
+    def get(self, service_id):
+        """Exact lookup by service ID, or None"""
+        service_id = service_id.strip().upper()
+        for position in self.id_index.search(service_id):
+            if self.service_ids[position].decode("utf-8") == service_id:
+                return self.customer(position)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the customer master index and time prefix searches")
+    parser.add_argument("path", nargs="?", default=DEFAULT_MASTER_PATH, help="Customer master CSV or .xlsx")
+    parser.add_argument("--search", action="append", default=[], help="Prefix to look up (repeatable)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    master = CustomerMaster.from_file(args.path)
+    print(f"Loaded {len(master):,} customers in {time.perf_counter() - start:.2f} s")
+    for query in args.search:
+        start = time.perf_counter()
+        results = master.search(query)
+        print(f"{query!r}: {len(results)} matches in {(time.perf_counter() - start) * 1000:.3f} ms")
+        for customer in results:
+            print(f"  {customer['service_id']}  {customer['customer_name']}  ({customer['customer_type']})")
+
+
+if __name__ == "__main__":
+    main()
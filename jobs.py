@@ -0,0 +1,388 @@
+"""Persistent background job queue with local worker processes.
+
+Jobs are rows in a SQLite database, so they survive browser refreshes and
+app restarts, and any process can submit, poll or cancel them. Worker
+processes claim queued jobs one at a time, report progress back to the job
+row and store a small JSON result; large outputs stay in the job's work
+directory. Cancelling a running job takes effect at its next progress
+report.
+
+A job that is cancelled or fails leaves nothing behind: the ledger rows it
+wrote (tagged with its run id) and its work directory are removed, so the
+file can simply be processed again. Running jobs renew a heartbeat; a job
+whose heartbeat lapses is taken as lost and undone the same way. Finished
+jobs and their files are purged after RETENTION_HOURS.
+
+Usage:
+    python jobs.py --workers 4
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sqlite3
+import threading
+import time
+
+from bill_store import BillStore, add_missing_columns
+from bulk_billing import BulkBillingRun
+from reconciliation import ReconciliationRun
+
+DEFAULT_JOBS_PATH = os.environ.get("JOBS_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db"))
+
+STATUSES = ["queued", "running", "done", "failed", "cancelled"]
+ACTIVE_STATUSES = ["queued", "running"]
+
+# Seconds an idle worker waits before looking for new jobs
+POLL_INTERVAL = 0.5
+
+# A running job renews its heartbeat this often (seconds); one silent for LEASE_SECONDS is lost
+HEARTBEAT_INTERVAL = 10
+LEASE_SECONDS = 60
+
+# Seconds between an idle worker's checks for lost jobs and old job files
+MAINTENANCE_INTERVAL = 60
+
+# Finished jobs, with their work directories, are kept this long
+RETENTION_HOURS = 24
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    heartbeat_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs (id) WHERE status = 'queued';
+"""
+
+# Job databases from before heartbeat leases need this (table, column, type)
+ADDED_COLUMNS = [("jobs", "heartbeat_at", "TEXT")]
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """Submit, poll and cancel jobs stored in a SQLite database"""
+
+    def __init__(self, db_path=DEFAULT_JOBS_PATH):
+        self.db_path = db_path
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            add_missing_columns(conn, ADDED_COLUMNS)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, kind, params):
+        """Queue a job of a registered kind; returns its id"""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self.connect() as conn:
+            return conn.execute(
+                "INSERT INTO jobs (kind, params, created_at) VALUES (?, ?, ?)",
+                (kind, json.dumps(params), _now())
+            ).lastrowid
+
+    def status(self, job_id):
+        """The job as a dict with decoded params and result, or None if there is no such job"""
+        with self.connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def result(self, job_id):
+        """Result of a finished job, or None if it has not finished successfully"""
+        job = self.status(job_id)
+        return job["result"] if job and job["status"] == "done" else None
+
+    def recent(self, limit=20):
+        with self.connect() as conn:
+            return [_job(row) for row in conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask a running one to stop; returns False if it already finished"""
+        with self.connect() as conn:
+            cancelled = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (_now(), job_id)
+            ).rowcount
+            requested = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            ).rowcount
+        return bool(cancelled or requested)
+
+    def claim(self, worker_pid):
+        """Mark the oldest queued job as running for this worker and return it, or None"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            # BEGIN IMMEDIATE takes the write lock first, so two workers never claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            started_at = _now()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (worker_pid, started_at, started_at, row["id"])
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return {**_job(row), "status": "running", "worker_pid": worker_pid, "started_at": started_at}
+
+    def report_progress(self, job_id, done, total):
+        """Record progress; raises JobCancelled if the job has been asked to stop or was given up as lost"""
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ?, heartbeat_at = ? WHERE id = ?",
+                (done, total, _now(), job_id)
+            )
+            row = conn.execute("SELECT status, cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row["cancel_requested"] or row["status"] != "running":
+            raise JobCancelled()
+
+    def heartbeat(self, job_id):
+        with self.connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (_now(), job_id))
+
+    def finish(self, job_id, status, result=None, error=None):
+        """Record the outcome of a running job; returns False if it was no longer running"""
+        with self.connect() as conn:
+            return bool(conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                (status, json.dumps(result) if result is not None else None, error, _now(), job_id)
+            ).rowcount)
+
+    def recover(self, lease_seconds=LEASE_SECONDS):
+        """Fail running jobs whose heartbeat has lapsed (e.g. their worker was killed); returns them"""
+        cutoff = (datetime.datetime.now() - datetime.timedelta(seconds=lease_seconds)).isoformat(timespec="seconds")
+        with self.connect() as conn:
+            stale = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ?", (cutoff,)
+            ).fetchall()
+        lost = []
+        for row in stale:
+            # Checked again in the update, so a job recovered by two workers is undone once
+            with self.connect() as conn:
+                if conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                    "WHERE id = ? AND status = 'running' AND COALESCE(heartbeat_at, started_at) < ?",
+                    ("Worker stopped before the job finished", _now(), row["id"], cutoff)
+                ).rowcount:
+                    lost.append(_job(row))
+        return lost
+
+    def purge(self, retention_hours=RETENTION_HOURS):
+        """Remove work directories that are no longer needed; returns how many jobs were deleted.
+
+        Cancelled and failed jobs lose their directory straight away. Finished
+        jobs older than retention_hours are deleted along with it. Directories
+        an active job still uses (such as a bulk run being turned into PDFs)
+        are kept.
+        """
+        cutoff = (datetime.datetime.now() - datetime.timedelta(hours=retention_hours)).isoformat(timespec="seconds")
+        with self.connect() as conn:
+            finished = [_job(row) for row in conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('failed', 'cancelled') OR (status = 'done' AND finished_at < ?)",
+                (cutoff,)
+            )]
+            active = [_job(row) for row in conn.execute("SELECT * FROM jobs WHERE status IN ('queued', 'running')")]
+        in_use = set()
+        for job in active:
+            in_use.add(job["params"].get("work_dir"))
+            in_use.add(job["params"].get("run", {}).get("work_dir"))
+        expired = [job["id"] for job in finished if (job["finished_at"] or "") < cutoff]
+        for job in finished:
+            work_dir = job["params"].get("work_dir")
+            if work_dir and work_dir not in in_use:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        with self.connect() as conn:
+            conn.executemany("DELETE FROM jobs WHERE id = ?", ((job_id,) for job_id in expired))
+        return len(expired)
+
+
+def _job(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def ledger_run_id(job):
+    """Tag on the ledger rows a job writes, so they can be removed if it does not finish"""
+    return f"job-{job['id']}"
+
+
+def discard_job_output(job):
+    """Undo a job that did not finish: remove its ledger rows and its work directory"""
+    BillStore().reverse_run(ledger_run_id(job))
+    if job["params"].get("work_dir"):
+        shutil.rmtree(job["params"]["work_dir"], ignore_errors=True)
+
+
+# Job kinds: each handler takes (params, progress_callback, run_id) and returns a JSON-able result
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+@job_handler("bulk_billing")
+def run_bulk_billing(params, progress_callback, run_id):
+    """Bill an uploaded readings file and write the bills to the ledger"""
+    bulk_run = BulkBillingRun(work_dir=params["work_dir"])
+    with open(params["path"], "rb") as f:
+        bulk_run.process(f, params["filename"], progress_callback, BillStore(), run_id)
+    return bulk_run.state()
+
+
+@job_handler("pdf_zip")
+def run_pdf_zip(params, progress_callback, run_id):
+    """Build the ZIP of PDF bills for a finished bulk billing run"""
+    bulk_run = BulkBillingRun.from_state(params["run"])
+    return {"pdf_zip_path": bulk_run.build_pdf_zip(params.get("logo_path"), progress_callback, params.get("language", "en"))}
+
+
+@job_handler("reconciliation")
+def run_reconciliation(params, progress_callback, run_id):
+    """Reconcile an uploaded payment file against the ledger"""
+    reconciliation_run = ReconciliationRun(BillStore(), work_dir=params["work_dir"], dayfirst=params.get("dayfirst", False))
+    with open(params["path"], "rb") as f:
+        reconciliation_run.process(f, params["filename"], params.get("apply", True), progress_callback, run_id)
+    return reconciliation_run.state()
+
+
+def send_heartbeats(job_queue, job_id, stop_event):
+    while not stop_event.wait(HEARTBEAT_INTERVAL):
+        job_queue.heartbeat(job_id)
+
+
+def run_job(job_queue, job):
+    """Run one claimed job to completion, recording its outcome"""
+    stop_heartbeats = threading.Event()
+    threading.Thread(target=send_heartbeats, args=(job_queue, job["id"], stop_heartbeats), daemon=True).start()
+    try:
+        result = JOB_HANDLERS[job["kind"]](
+            job["params"], lambda done, total: job_queue.report_progress(job["id"], done, total), ledger_run_id(job)
+        )
+    except JobCancelled:
+        # Undone before the status changes, so a finished job never shows half-removed rows
+        discard_job_output(job)
+        job_queue.finish(job["id"], "cancelled")
+    except Exception as e:
+        print(f"Job {job['id']} ({job['kind']}) failed: {e}")
+        discard_job_output(job)
+        job_queue.finish(job["id"], "failed", error=str(e))
+    else:
+        if not job_queue.finish(job["id"], "done", result):
+            # Given up as lost while finishing; recover() has already reported it as failed
+            discard_job_output(job)
+    finally:
+        stop_heartbeats.set()
+        # The upload is not needed once the job is over; results stay in the work directory
+        upload_path = job["params"].get("path")
+        if upload_path and os.path.exists(upload_path):
+            os.remove(upload_path)
+
+
+def maintain(job_queue):
+    """Undo jobs whose worker was lost and remove files of jobs that are no longer needed"""
+    for job in job_queue.recover():
+        print(f"Job {job['id']} ({job['kind']}) lost its worker; undoing it")
+        discard_job_output(job)
+    job_queue.purge()
+
+
+def worker_loop(db_path=DEFAULT_JOBS_PATH, stop_event=None, poll_interval=POLL_INTERVAL):
+    """Claim and run jobs until stop_event is set"""
+    # Ctrl+C stops the pool through stop_event, letting running jobs finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    job_queue = JobQueue(db_path)
+    pid = os.getpid()
+    last_maintenance = None
+    while stop_event is None or not stop_event.is_set():
+        if last_maintenance is None or time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+            maintain(job_queue)
+            last_maintenance = time.monotonic()
+        job = job_queue.claim(pid)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(job_queue, job)
+
+
+class WorkerPool:
+    """A fixed number of worker processes serving one job database"""
+
+    def __init__(self, db_path=DEFAULT_JOBS_PATH, workers=2):
+        self.db_path = db_path
+        self.workers = workers
+        # Spawned rather than forked so workers do not inherit the app's threads
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.processes = []
+
+    def start(self):
+        for _ in range(self.workers):
+            process = self.context.Process(target=worker_loop, args=(self.db_path, self.stop_event), daemon=True)
+            process.start()
+            self.processes.append(process)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop taking new jobs and wait for running ones to finish"""
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--db", default=DEFAULT_JOBS_PATH, help="Job database (defaults to JOBS_DB_PATH)")
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.db, args.workers).start()
+    print(f"{args.workers} workers serving {args.db}; press Ctrl+C to stop")
+    try:
+        for process in pool.processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("Stopping after running jobs finish...")
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
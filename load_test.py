@@ -0,0 +1,337 @@
+"""Concurrent-session load test for the Electricity Bill Calculator.
+
+Starts one `streamlit run` server for app.py and connects several simulated
+clerks to it at the same time over Streamlit's websocket protocol, the way
+browser tabs do. The sessions share the server's script threads, caches and
+memory, so blocking work in one session (the logo download, PDF rendering)
+shows up in the others' latency. Each session runs a realistic flow: open
+the app, fill in the form field by field, calculate a bill (which also
+renders the preview and the PDF download link), open Bill History and go
+back to Calculate Bill.
+
+Latency is measured at the client, from sending a rerun to receiving the
+server's script-finished message. Memory per session is the growth of the
+server process's RSS with every session connected, over a warmed-up server,
+divided by the number of sessions.
+
+Usage:
+    python load_test.py --sessions 20 --iterations 5
+"""
+import argparse
+import asyncio
+import datetime
+import math
+import os
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+CUSTOMER_TYPES = ["Domestic", "Commercial", "Industrial"]
+
+# Seconds to wait for the server to pass its health check
+STARTUP_TIMEOUT = 60
+
+# Seconds to let the server settle before reading its memory
+SETTLE_SECONDS = 2
+
+
+def process_rss_mb(pid):
+    """Return the resident memory of a process in MB"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        # Not on Linux: ask ps, which reports KB
+        output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+        return int(output.strip() or 0) / 1024
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StreamlitServer:
+    """A `streamlit run` subprocess serving app.py on a free local port"""
+
+    def __init__(self, work_dir):
+        self.port = _free_port()
+        self.log_path = os.path.join(work_dir, "server.log")
+        # Keep simulated bills out of the real ledger, and the server from starting job workers
+        env = {
+            **os.environ,
+            "BILL_DB_PATH": os.path.join(work_dir, "bill_ledger.db"),
+            "JOBS_DB_PATH": os.path.join(work_dir, "jobs.db"),
+            "JOB_WORKERS": "0",
+        }
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "streamlit", "run", APP_FILE, "--server.headless", "true",
+                 "--server.port", str(self.port), "--browser.gatherUsageStats", "false"],
+                env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+        self.url = f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def wait_until_ready(self):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        with open(self.log_path) as log:
+            raise RuntimeError(f"Streamlit server did not start:\n{log.read()[-2000:]}")
+
+    def rss_mb(self):
+        return process_rss_mb(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class ClientSession:
+    """One simulated clerk: a websocket connection to the server, like a browser tab.
+
+    Like the browser, the client sends the value of every widget it has seen
+    with each rerun, and a button press as a one-off trigger.
+    """
+
+    def __init__(self, url, session_no, timeout):
+        self.url = url
+        self.session_no = session_no
+        self.timeout = timeout
+        self.random = random.Random(session_no)
+        self.connection = None
+        self.widgets = {}
+        self.states = {}
+        self.elements = []
+        self.latencies = {}
+        self.errors = []
+
+    async def connect(self):
+        # No size limit: reruns carry the PDF download link inline
+        self.connection = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
+
+    async def rerun(self, step, trigger=None):
+        """Ask the server to rerun the script and wait for it to finish"""
+        message = BackMsg()
+        message.rerun_script.page_script_hash = ""
+        message.rerun_script.widget_states.widgets.extend(self.states.values())
+        if trigger is not None:
+            message.rerun_script.widget_states.widgets.append(trigger)
+
+        start = time.perf_counter()
+        await self.connection.send(message.SerializeToString())
+        elements = []
+        while True:
+            data = await asyncio.wait_for(self.connection.recv(), self.timeout)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "script_finished":
+                break
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element_type = forward.delta.new_element.WhichOneof("type")
+                elements.append((element_type, getattr(forward.delta.new_element, element_type)))
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "add_block":
+                elements.append((forward.delta.add_block.WhichOneof("type"), forward.delta.add_block))
+        self.latencies.setdefault(step, []).append(time.perf_counter() - start)
+
+        self.elements = elements
+        for element_type, element in elements:
+            if element_type == "exception":
+                self.errors.append(f"{step}: {element.type}: {element.message}")
+            elif hasattr(element, "id") and hasattr(element, "label") and element.id:
+                # Widget ids end with the widget's key, if it has one
+                key = element.id.split("-", 2)[-1]
+                self.widgets[element.label] = (element_type, element.id)
+                if key != "None":
+                    self.widgets[key] = (element_type, element.id)
+
+    def _state(self, name):
+        element_type, widget_id = self.widgets[name]
+        state = WidgetState(id=widget_id)
+        return element_type, state
+
+    async def set(self, step, name, value):
+        """Change a widget (found by key or label) and rerun, as a browser does on edit"""
+        element_type, state = self._state(name)
+        if element_type == "number_input":
+            state.double_value = value
+        elif element_type == "date_input":
+            state.string_array_value.data.append(value.isoformat())
+        else:
+            state.string_value = value
+        self.states[state.id] = state
+        await self.rerun(step)
+
+    async def click(self, step, label):
+        _, state = self._state(label)
+        state.trigger_value = True
+        await self.rerun(step, trigger=state)
+
+    def has(self, element_type, text=""):
+        return any(
+            t == element_type and text in (getattr(e, "body", "") or "") for t, e in self.elements
+        )
+
+    async def calculate(self, iteration):
+        customer_type = self.random.choice(CUSTOMER_TYPES)
+        previous_reading = float(self.random.randint(0, 5000))
+        units = float(self.random.randint(20, 600))
+        bill_date = datetime.date.today() - datetime.timedelta(days=30 * iteration)
+
+        await self.set("edit", "customer_type", customer_type)
+        await self.set("edit", "service_id", f"SVC{self.session_no:05d}")
+        await self.set("edit", "customer_name", f"Clerk Test {self.session_no}")
+        await self.set("edit", "Bill Date", bill_date)
+        await self.set("edit", "Current Reading (kWh)", previous_reading + units)
+        await self.set("edit", "previous_reading", previous_reading)
+        await self.click("calculate", "Calculate Bill")
+
+        if not self.has("alert", "Bill calculated successfully"):
+            self.errors.append("calculate: no success message")
+        # Preview and PDF download link are rendered in the same rerun
+        if not self.has("expandable"):
+            self.errors.append("preview: expander missing")
+        if not self.has("markdown", "data:application/pdf"):
+            self.errors.append("download: PDF link missing")
+
+    async def history(self):
+        await self.set("history", "Navigation", "Bill History")
+        if not self.has("dataframe"):
+            self.errors.append("history: table missing")
+        await self.set("back", "Navigation", "Calculate Bill")
+
+    async def run(self, iterations):
+        await self.rerun("open")
+        for iteration in range(iterations):
+            await self.calculate(iteration)
+            await self.history()
+        return self
+
+
+async def _run_clients(server, sessions, iterations, timeout):
+    # Warm up the server (imports, caches, logo) so it doesn't count as session memory
+    warmup = ClientSession(server.url, sessions, timeout)
+    await warmup.connect()
+    await warmup.run(1)
+    await warmup.close()
+    await asyncio.sleep(SETTLE_SECONDS)
+    baseline_mb = server.rss_mb()
+
+    clients = [ClientSession(server.url, n, timeout) for n in range(sessions)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(client.run(iterations) for client in clients), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    # Read memory while every session is still connected and holding its state
+    await asyncio.sleep(SETTLE_SECONDS)
+    final_mb = server.rss_mb()
+    await asyncio.gather(*(client.close() for client in clients))
+
+    latencies = {}
+    errors = [f"warm-up: {e}" for e in warmup.errors]
+    for client, outcome in zip(clients, outcomes):
+        for step, values in client.latencies.items():
+            latencies.setdefault(step, []).extend(values)
+        errors.extend(f"session {client.session_no}: {e}" for e in client.errors)
+        if isinstance(outcome, BaseException):
+            errors.append(f"session {client.session_no}: {type(outcome).__name__}: {outcome}")
+
+    memory = {
+        "baseline_mb": baseline_mb,
+        "final_mb": final_mb,
+        "per_session_mb": (final_mb - baseline_mb) / sessions,
+        "elapsed_s": elapsed,
+    }
+    return latencies, errors, memory
+
+
+def run_load_test(sessions, iterations, timeout=60):
+    """Run sessions concurrently against one server and return (latencies by step, errors, memory stats)"""
+    work_dir = tempfile.mkdtemp(prefix="load_test_")
+    server = StreamlitServer(work_dir)
+    try:
+        server.wait_until_ready()
+        return asyncio.run(_run_clients(server, sessions, iterations, timeout))
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(latencies, errors, memory, sessions, iterations):
+    print(f"\nSessions: {sessions} concurrent on one server  Iterations per session: {iterations}  "
+          f"Wall time: {memory['elapsed_s']:.2f}s")
+    print(f"\n{'Step':<12}{'Reruns':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}")
+    all_values = []
+    for step, values in latencies.items():
+        all_values.extend(values)
+        print(f"{step:<12}{len(values):>8}"
+              f"{percentile(values, 50) * 1000:>12.1f}"
+              f"{percentile(values, 95) * 1000:>12.1f}"
+              f"{percentile(values, 99) * 1000:>12.1f}")
+    print(f"{'all':<12}{len(all_values):>8}"
+          f"{percentile(all_values, 50) * 1000:>12.1f}"
+          f"{percentile(all_values, 95) * 1000:>12.1f}"
+          f"{percentile(all_values, 99) * 1000:>12.1f}")
+
+    print(f"\nServer memory: warmed up {memory['baseline_mb']:.1f} MB, "
+          f"with {sessions} sessions {memory['final_mb']:.1f} MB")
+    print(f"Memory per session: {memory['per_session_mb']:.2f} MB")
+
+    if errors:
+        print(f"\n{len(errors)} errors:")
+        for error in errors[:20]:
+            print(f"  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for app.py on one Streamlit server")
+    parser.add_argument("--sessions", type=int, default=10, help="Number of concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="Calculate/history cycles per session")
+    parser.add_argument("--timeout", type=float, default=60, help="Timeout for a single rerun (seconds)")
+    args = parser.parse_args()
+
+    latencies, errors, memory = run_load_test(args.sessions, args.iterations, args.timeout)
+    print_report(latencies, errors, memory, args.sessions, args.iterations)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Benchmark PDF bill rendering with and without embedded Unicode fonts.
+
+Compares per-bill render time and PDF size of the Helvetica-only output
+(₹ printed as "Rs.") against bills with the ₹ glyph embedded, and against
+Telugu bills when a Telugu font is installed. Font registration is timed
+separately since it happens once per process.
+
+Usage:
+    python pdf_benchmark.py --bills 500
+"""
+import argparse
+import time
+
+import bill_pdf
+from bill_pdf import create_bill_pdf, get_bill_fonts
+
+SAMPLE_BILL = {
+    "Invoice_No": "AP-20250401100000-000001",
+    "Customer_Type": "Industrial",
+    "Service_ID": "SVC0003",
+    "Customer_Name": "Tirupati Mills",
+    "Current_Reading": 56210.0,
+    "Previous_Reading": 52100.0,
+    "Units_Consumed": 4110.0,
+    "Peak_Hour_Units": 900.0,
+    "Net_Bill": 26460.0,
+    "Service_Charge": 1323.0,
+    "Total_Bill": 27783.0,
+    "Bill_Date": "2025-04-01",
+    "Due_Date": "2025-04-22",
+    "Late_Fee": 555.66,
+    "Amount_After_Due_Date": 28338.66,
+}
+
+
+def time_registration(language):
+    start = time.perf_counter()
+    fonts = get_bill_fonts(language, True)
+    return time.perf_counter() - start, fonts
+
+
+def time_bills(bills, language, embed_fonts):
+    """Return (ms per bill, bytes per PDF) for rendering bills one at a time"""
+    size = len(create_bill_pdf(SAMPLE_BILL, language=language, embed_fonts=embed_fonts))
+    start = time.perf_counter()
+    for n in range(bills):
+        create_bill_pdf({**SAMPLE_BILL, "Invoice_No": f"AP-20250401100000-{n:06d}"},
+                        language=language, embed_fonts=embed_fonts)
+    return (time.perf_counter() - start) / bills * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF bill rendering")
+    parser.add_argument("--bills", type=int, default=300, help="Bills rendered per variant")
+    args = parser.parse_args()
+
+    registration, fonts = time_registration("en")
+    print(f"Font registration (once per process): {registration * 1000:.0f} ms, "
+          f"shaping {'on' if bill_pdf.SHAPING else 'off (pip install uharfbuzz)'}")
+
+    variants = [("Helvetica only", "en", False), ("Unicode (₹ embedded)", "en", True)]
+    if fonts["unicode"]:
+        te_registration, te_fonts = time_registration("te")
+        if te_fonts["telugu"]:
+            print(f"Telugu font registration: {te_registration * 1000:.0f} ms")
+            variants.append(("Telugu", "te", True))
+        else:
+            print("No Telugu font found (set BILL_FONT_DIR); skipping Telugu bills")
+    else:
+        print("No Unicode font found (set BILL_FONT_DIR); only Helvetica can be measured")
+        variants = variants[:1]
+
+    print(f"\n{'Variant':<24}{'ms/bill':>10}{'bytes/PDF':>12}{'vs Helvetica':>16}")
+    baseline = None
+    for name, language, embed_fonts in variants:
+        ms, size = time_bills(args.bills, language, embed_fonts)
+        baseline = baseline or (ms, size)
+        print(f"{name:<24}{ms:>10.2f}{size:>12,}"
+              f"{f'x{ms / baseline[0]:.2f} / x{size / baseline[1]:.2f}':>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from bill_store import normalize_service_id
+from bulk_billing import count_rows, iter_reading_chunks, replace_when_done
+
+# Columns expected in a payment file
+REQUIRED_COLUMNS = ["Service_ID", "Amount", "Payment_Date"]
+OPTIONAL_COLUMNS = ["Invoice_No", "Reference"]
+
+STATUSES = ["matched", "partial", "overpaid", "unmatched", "duplicate", "invalid"]
+
+# Rows with these statuses are reported but never recorded in the ledger
+REJECTED_STATUSES = ["duplicate", "invalid"]
+
+RESULT_COLUMNS = [
+    "Service_ID", "Invoice_No", "Reference", "Payment_Date", "Amount", "Bill_Invoice_No", "Due_Date",
+    "Amount_Due", "Paid_To_Date", "Difference", "Status", "Note"
+]
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Payment_Date is read in exactly one of these formats, never guessed per row
+ISO_DATE_FORMAT = "%Y-%m-%d"
+DAYFIRST_DATE_FORMAT = "%d/%m/%Y"
+
+# Payments within half a paisa of the amount due count as exact
+TOLERANCE = 0.005
+
+
+def sample_payments_csv():
+    """Template payment file offered for download on the reconciliation page"""
+    sample = pd.DataFrame([
+        ["SVC0001", "", 614.25, "2025-04-10", "UPI-88231"],
+        ["SVC0002", "AP-20250401100000-3F9A1C-000002", 2000.00, "2025-04-12", "NEFT-10022"],
+    ], columns=REQUIRED_COLUMNS[:1] + ["Invoice_No"] + REQUIRED_COLUMNS[1:] + ["Reference"])
+    return sample.to_csv(index=False)
+
+
+def best_bill(candidates):
+    """Keep one candidate bill per payment: exact amount due first, then issued by the payment date, then latest"""
+    on_time = candidates["Payment_Date"] <= candidates["due_date"]
+    due = np.where(on_time, candidates["total_bill"], candidates["amount_after_due_date"]) - candidates["paid_amount"]
+    candidates = candidates.assign(
+        exact=np.abs(candidates["Amount"] - due) < TOLERANCE,
+        issued=candidates["bill_date"] <= candidates["Payment_Date"]
+    ).sort_values(["payment_no", "exact", "issued", "bill_date"], ascending=[True, False, False, False])
+    return candidates.drop_duplicates("payment_no").drop(columns=["exact", "issued"])
+
+
+def match_payments(payments, bills):
+    """Hash-join one chunk of payments to candidate bills.
+
+    payments is a chunk of the payment file; bills holds every ledger bill
+    for the services in the chunk (see BillStore.bills_for_services). Each
+    payment is matched to one bill: by service ID and invoice number when
+    given, otherwise to a bill whose amount due equals the payment, otherwise
+    to the latest bill issued on or before the payment date. The same ranking
+    picks one bill when an invoice number is shared by several ledger bills.
+    """
+    payments = payments.reset_index(drop=True)
+    payments["payment_no"] = np.arange(len(payments))
+    # Payments without a readable date cannot be placed against a due date
+    matchable = payments["Payment_Date"].notna()
+    invoice = payments["Invoice_No"].fillna("").astype(str).str.strip()
+    has_invoice = matchable & (invoice != "")
+
+    bills = bills.rename(columns={"invoice_no": "Bill_Invoice_No", "service_id": "Service_ID"})
+
+    # 1. Service ID + invoice number
+    by_invoice = best_bill(payments[has_invoice].assign(Bill_Invoice_No=invoice[has_invoice]).merge(
+        bills, on=["Service_ID", "Bill_Invoice_No"], how="inner"))
+
+    # 2. Service ID + amount, falling back to the latest bill before the payment
+    by_amount = best_bill(payments[matchable & ~payments["payment_no"].isin(by_invoice["payment_no"])].merge(
+        bills, on="Service_ID", how="inner"))
+
+    matched = pd.concat([by_invoice, by_amount], ignore_index=True)
+    unmatched = payments[~payments["payment_no"].isin(matched["payment_no"])]
+
+    # Amount due depends on whether the payment arrived by the due date
+    on_time = matched["Payment_Date"] <= matched["due_date"]
+    matched["Amount_Due"] = np.where(on_time, matched["total_bill"], matched["amount_after_due_date"])
+    # Several payments in one chunk can settle the same bill between them
+    matched = matched.sort_values(["Payment_Date", "payment_no"])
+    paid_before = matched["paid_amount"] + matched.groupby("bill_id")["Amount"].cumsum() - matched["Amount"]
+    matched["Paid_To_Date"] = paid_before + matched["Amount"]
+    matched["Difference"] = (matched["Paid_To_Date"] - matched["Amount_Due"]).round(2)
+    matched["Status"] = np.select(
+        [matched["Difference"] < -TOLERANCE, matched["Difference"] > TOLERANCE],
+        ["partial", "overpaid"],
+        "matched"
+    )
+    # Only the part of a payment that covers total_bill reduces the overdue totals
+    matched["credited"] = (
+        np.minimum(matched["Paid_To_Date"], matched["total_bill"]) - np.minimum(paid_before, matched["total_bill"])
+    ).clip(lower=0)
+    matched["Due_Date"] = matched["due_date"]
+
+    unmatched = unmatched.assign(Status="unmatched")
+    return pd.concat([matched, unmatched], ignore_index=True).sort_values("payment_no")
+
+
+class ReconciliationRun:
+    """Reconciles a payment file against the bill ledger chunk by chunk.
+
+    Each chunk fetches only the bills of its own services, so the work is
+    linear in the size of the payment file. Per-payment results are written
+    to a CSV in a private work directory; only the summary stays in memory.
+    """
+
+    def __init__(self, bill_store, chunk_size=DEFAULT_CHUNK_SIZE, work_dir=None, dayfirst=False):
+        self.bill_store = bill_store
+        self.chunk_size = chunk_size
+        # Payment dates are dd/mm/yyyy when dayfirst, otherwise yyyy-mm-dd
+        self.date_format = DAYFIRST_DATE_FORMAT if dayfirst else ISO_DATE_FORMAT
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="reconciliation_")
+        self.results_path = os.path.join(self.work_dir, "reconciliation.csv")
+        self.total_rows = 0
+        self.summary = {status: {"count": 0, "amount": 0.0} for status in STATUSES}
+        # (service ID, reference) pairs seen in a run that does not record them in the ledger
+        self.seen_references = set()
+
+    def state(self):
+        """Status counts and amounts of a finished run as plain data; from_state reopens its report"""
+        return {
+            "chunk_size": self.chunk_size, "work_dir": self.work_dir,
+            "total_rows": self.total_rows, "summary": self.summary,
+        }
+
+    @classmethod
+    def from_state(cls, state, bill_store=None):
+        run = cls(bill_store, state["chunk_size"], state["work_dir"])
+        run.total_rows = state["total_rows"]
+        run.summary = state["summary"]
+        return run
+
+    def prepare_chunk(self, payments):
+        """Clean one chunk; rows whose amount cannot be read or whose date is not in date_format get a Note"""
+        missing = [c for c in REQUIRED_COLUMNS if c not in payments.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        for column in OPTIONAL_COLUMNS:
+            if column not in payments:
+                payments[column] = None
+        payments["Service_ID"] = payments["Service_ID"].map(normalize_service_id)
+        payments["Reference"] = payments["Reference"].astype("string").str.strip().replace("", pd.NA)
+        raw_amount = payments["Amount"]
+        raw_date = payments["Payment_Date"]
+        payments["Amount"] = pd.to_numeric(raw_amount, errors="coerce")
+        payments["Payment_Date"] = pd.to_datetime(raw_date, format=self.date_format, errors="coerce").dt.strftime("%Y-%m-%d")
+        # An unreadable amount or date must not be matched as a ₹0 payment or recorded in the ledger
+        payments["Note"] = np.select(
+            [payments["Payment_Date"].isna(), payments["Amount"].isna()],
+            ["Unreadable Payment_Date: " + raw_date.astype(str), "Unreadable Amount: " + raw_amount.astype(str)],
+            ""
+        )
+        return payments
+
+    def find_duplicates(self, payments):
+        """Mask of payments whose Reference was already seen for the same service.
+
+        A reference counts as seen when it is recorded in the ledger, appears
+        earlier in this file, or (when not applying) in an earlier chunk.
+        Payments without a reference are never treated as duplicates.
+        """
+        has_reference = payments["Reference"].notna()
+        keys = list(zip(payments.loc[has_reference, "Service_ID"], payments.loc[has_reference, "Reference"]))
+        known = self.bill_store.known_references(keys) | self.seen_references
+        seen = pd.Series(False, index=payments.index)
+        seen[has_reference] = [key in known for key in keys]
+        return has_reference & (seen | payments.duplicated(["Service_ID", "Reference"], keep="first"))
+
+    def process(self, file, filename, apply=True, progress_callback=None, run_id=None):
+        """Reconcile every payment in the file, reporting (rows done, total rows).
+
+        With apply=True the payments are recorded in the ledger under run_id,
+        so bills they settle stop counting as overdue and are not matched
+        again. Duplicate and invalid rows are only reported.
+        """
+        expected_rows = count_rows(file, filename)
+        with replace_when_done(self.results_path) as partial_path, \
+                open(partial_path, "w", newline="", encoding="utf-8") as out:
+            out.write(",".join(RESULT_COLUMNS) + "\n")
+            for payments in iter_reading_chunks(file, filename, self.chunk_size):
+                results = self.reconcile_chunk(self.prepare_chunk(payments), apply, run_id)
+                results[RESULT_COLUMNS].to_csv(out, header=False, index=False)
+
+                counts = results.groupby("Status")["Amount"].agg(["size", "sum"])
+                for status, row in counts.iterrows():
+                    self.summary[status]["count"] += int(row["size"])
+                    self.summary[status]["amount"] += float(row["sum"])
+                self.total_rows += len(results)
+                if progress_callback:
+                    progress_callback(self.total_rows, max(expected_rows, self.total_rows))
+        return self
+
+    def reconcile_chunk(self, payments, apply=True, run_id=None):
+        """Match one prepared chunk, record it if apply, and return its result rows in file order"""
+        payments["row_no"] = np.arange(len(payments))
+        invalid = payments["Note"] != ""
+        duplicate = ~invalid & self.find_duplicates(payments)
+        rejected = payments[invalid | duplicate].assign(Status=np.where(invalid[invalid | duplicate], "invalid", "duplicate"))
+        rejected.loc[rejected["Status"] == "duplicate", "Note"] = "Reference already received"
+
+        valid = payments[~invalid & ~duplicate]
+        bills = self.bill_store.bills_for_services(valid["Service_ID"].unique().tolist())
+        results = match_payments(valid, bills)
+
+        if apply:
+            self.bill_store.add_payments(results.rename(columns={
+                "Service_ID": "service_id", "Payment_Date": "payment_date", "Amount": "amount",
+                "Reference": "reference", "Status": "status"
+            }).assign(invoice_no=results["Bill_Invoice_No"].fillna(results["Invoice_No"])), run_id)
+        else:
+            referenced = valid[valid["Reference"].notna()]
+            self.seen_references.update(zip(referenced["Service_ID"], referenced["Reference"]))
+
+        return pd.concat([results, rejected], ignore_index=True).sort_values("row_no")
+
+    def summary_frame(self):
+        return pd.DataFrame([
+            {"Status": status.title(), "Payments": values["count"], "Amount": round(values["amount"], 2)}
+            for status, values in self.summary.items()
+        ])
@@ -0,0 +1,176 @@
+"""Due-date reminder engine.
+
+Reminder events are scheduled in the ledger when each bill is written (see
+bill_store.REMINDER_OFFSETS). A tick pops only the reminders that have come
+due through an index on pending reminder dates, so its cost depends on the
+number of reminders due rather than the number of open bills. Notifications
+go to a local outbox, so no external service is needed.
+
+Only the latest reminder that applies to a bill is sent: a due_soon or
+due_today reminder popped after the next kind has come due (for example on
+a backdated ledger) is marked skipped instead.
+
+Usage:
+    python reminders.py --outbox reminders_outbox.jsonl
+    python reminders.py --outbox reminders_outbox.db --interval 3600
+    python reminders.py --backfill --as-of 2025-04-30
+"""
+import argparse
+import datetime
+import json
+import sqlite3
+import time
+
+from bill_store import BillStore, REMINDER_OFFSETS
+
+MESSAGES = {
+    "due_soon": "Dear {customer_name}, your electricity bill {invoice_no} of ₹{total_bill:.2f} "
+                "for service {service_id} is due on {due_date}.",
+    "due_today": "Dear {customer_name}, your electricity bill {invoice_no} of ₹{total_bill:.2f} "
+                 "for service {service_id} is due today. Pay today to avoid a late fee of ₹{late_fee:.2f}.",
+    "overdue": "Dear {customer_name}, your electricity bill {invoice_no} for service {service_id} "
+               "was due on {due_date}. Amount payable now is ₹{amount_after_due_date:.2f}.",
+}
+
+# Bill column holding the amount owed when each kind is sent; an overdue bill also owes the late fee
+AMOUNT_OWED = {"due_soon": "total_bill", "due_today": "total_bill", "overdue": "amount_after_due_date"}
+
+# Position of each kind in the reminder sequence; a later kind supersedes an earlier one
+KIND_ORDER = {kind: position for position, (kind, _) in enumerate(REMINDER_OFFSETS)}
+
+# Days from the due date at which each kind is superseded by the next one
+SUPERSEDED_AFTER = {kind: days for (kind, _), (_, days) in zip(REMINDER_OFFSETS, REMINDER_OFFSETS[1:])}
+
+
+def paid(reminder):
+    """True once the payments on the bill cover what is owed at this kind of reminder"""
+    return reminder["paid_amount"] >= reminder[AMOUNT_OWED[reminder["kind"]]]
+
+
+def superseded(reminder, as_of):
+    """True once the next kind of reminder for the same bill has come due"""
+    days = SUPERSEDED_AFTER.get(reminder["kind"])
+    if days is None:
+        return False
+    next_due = datetime.date.fromisoformat(reminder["due_date"]) + datetime.timedelta(days=days)
+    return as_of >= next_due.isoformat()
+
+
+class FileOutbox:
+    """Appends notifications to a JSON Lines file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, notifications):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for notification in notifications:
+                f.write(json.dumps(notification, ensure_ascii=False) + "\n")
+
+
+class SQLiteOutbox:
+    """Stores notifications in an outbox table for a sender to pick up"""
+
+    def __init__(self, path):
+        self.path = path
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    service_id TEXT NOT NULL,
+                    invoice_no TEXT,
+                    message TEXT NOT NULL,
+                    sent_at TEXT
+                )
+            """)
+
+    def send(self, notifications):
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT INTO outbox (created_at, kind, service_id, invoice_no, message) VALUES (?, ?, ?, ?, ?)",
+                ((n["created_at"], n["kind"], n["service_id"], n["invoice_no"], n["message"]) for n in notifications)
+            )
+
+
+def outbox_for_path(path):
+    """Pick the outbox type from the file extension"""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteOutbox(path)
+    return FileOutbox(path)
+
+
+class ReminderScheduler:
+    """Pops due reminders from the ledger and writes them to an outbox.
+
+    Delivery is at-least-once: notifications are written to the outbox before
+    their reminders are marked sent, so a crash in between can repeat a batch.
+    """
+
+    def __init__(self, bill_store, outbox, batch_size=1000):
+        self.bill_store = bill_store
+        self.outbox = outbox
+        self.batch_size = batch_size
+
+    def tick(self, as_of=None):
+        """Send the reminders due on or before as_of (default today); returns (sent, skipped)"""
+        as_of = as_of or datetime.date.today().strftime("%Y-%m-%d")
+        sent = skipped = 0
+        while True:
+            due = self.bill_store.pop_due_reminders(as_of, self.batch_size)
+            if not due:
+                return sent, skipped
+
+            # One reminder per bill: the latest kind in the batch
+            latest = {}
+            for r in due:
+                if r["bill_id"] not in latest or KIND_ORDER[r["kind"]] > KIND_ORDER[latest[r["bill_id"]]["kind"]]:
+                    latest[r["bill_id"]] = r
+            # Bills paid in full since scheduling need no reminder, and stale kinds are dropped
+            unpaid = [r for r in due if latest[r["bill_id"]] is r and not paid(r) and not superseded(r, as_of)]
+            unpaid_ids = {r["reminder_id"] for r in unpaid}
+            skipped_ids = [r["reminder_id"] for r in due if r["reminder_id"] not in unpaid_ids]
+
+            created_at = datetime.datetime.now().isoformat(timespec="seconds")
+            notifications = [{
+                "created_at": created_at,
+                "kind": r["kind"],
+                "service_id": r["service_id"],
+                "invoice_no": r["invoice_no"],
+                "due_date": r["due_date"],
+                "message": MESSAGES[r["kind"]].format(**{**r, "customer_name": r["customer_name"] or "Customer"}),
+            } for r in unpaid]
+            if notifications:
+                self.outbox.send(notifications)
+
+            self.bill_store.mark_reminders([r["reminder_id"] for r in unpaid], "sent")
+            self.bill_store.mark_reminders(skipped_ids, "skipped")
+            sent += len(unpaid)
+            skipped += len(skipped_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send due-date reminders to a local outbox")
+    parser.add_argument("--outbox", default="reminders_outbox.jsonl", help="Outbox file (.jsonl, or .db for SQLite)")
+    parser.add_argument("--db", default=None, help="Bill ledger database (defaults to BILL_DB_PATH)")
+    parser.add_argument("--as-of", default=None, help="Send reminders due on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--interval", type=float, default=0, help="Keep running, ticking every N seconds")
+    parser.add_argument("--backfill", action="store_true",
+                        help="First schedule reminders for bills written before reminders existed")
+    args = parser.parse_args()
+
+    bill_store = BillStore(args.db) if args.db else BillStore()
+    if args.backfill:
+        bill_store.backfill_reminders()
+    scheduler = ReminderScheduler(bill_store, outbox_for_path(args.outbox))
+    while True:
+        sent, skipped = scheduler.tick(args.as_of)
+        print(f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S} sent {sent} reminders, skipped {skipped} paid or superseded")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Seeded synthetic meter readings for development and load testing.
+
+Generates monthly readings for a population of services in the Bulk Billing
+file format. Readings are cumulative per service, consumption follows a
+per-category lognormal with a seasonal swing (so domestic bills fall in
+every slab), industrial services carry a peak-hour share, meters roll over
+at their digit limit, and a small share of rows are bad readings. A
+Reading_Flag column labels every row.
+
+Services are generated in fixed blocks, each with its own random stream
+derived from the seed, so the same seed and months always give the same
+rows however the output is chunked, and a smaller dataset is a prefix of a
+larger one. Service IDs have a fixed width (SVC000000001), so the same
+service has the same ID at every scale. Only one chunk is held in memory, so
+10^8 rows stream to CSV or Parquet in bounded memory.
+
+Usage:
+    python synthetic_data.py --rows 1000000 --out readings.csv
+    python synthetic_data.py --rows 100000000 --out readings.parquet --customers customer_master.csv
+"""
+import argparse
+import datetime
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_billing import REQUIRED_COLUMNS, OPTIONAL_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNS = REQUIRED_COLUMNS + OPTIONAL_COLUMNS + ["Reading_Flag"]
+CUSTOMER_COLUMNS = ["Service_ID", "Customer_Name", "Customer_Type"]
+
+CATEGORIES = ["Domestic", "Commercial", "Industrial"]
+CATEGORY_MIX = [0.85, 0.12, 0.03]
+
+# Median monthly units and lognormal sigma of a service's usual consumption
+CONSUMPTION = {
+    "Domestic": (140.0, 0.6),
+    "Commercial": (900.0, 0.8),
+    "Industrial": (6000.0, 0.9),
+}
+# Month-to-month variation around a service's usual consumption
+MONTHLY_SIGMA = 0.15
+# Consumption factor by calendar month (summer cooling load peaks in April-May)
+SEASONAL_FACTOR = [0.85, 0.9, 1.05, 1.2, 1.3, 1.25, 1.05, 1.0, 1.0, 0.95, 0.9, 0.85]
+# Share of domestic services that are vacant and use next to nothing
+VACANT_SHARE = 0.03
+
+# Beta distribution of the industrial peak-hour share (mean 25%)
+PEAK_SHARE_BETA = (2.0, 6.0)
+
+# Meters wrap to zero after this many digits
+METER_DIGITS = {"Domestic": 5, "Commercial": 6, "Industrial": 7}
+
+BAD_READING_RATE = 0.002
+BAD_READING_KINDS = ["missing", "reversed", "spike", "peak_exceeds"]
+
+# Service IDs are "SVC" plus this many digits, enough for 10^8 services and more
+SERVICE_ID_DIGITS = 9
+
+# Services per random stream; fixed so output does not depend on chunk size
+BLOCK_SERVICES = 4096
+DEFAULT_CHUNK_ROWS = 500000
+
+FIRST_NAMES = np.array([
+    "Ravi", "Sri", "Lakshmi", "Venkata", "Anil", "Padma", "Suresh", "Kiran", "Rama", "Gopal",
+    "Srinivas", "Durga", "Naga", "Sai", "Satya", "Radha", "Krishna", "Madhavi", "Prasad", "Sunitha",
+])
+SURNAMES = np.array([
+    "Kumar", "Reddy", "Rao", "Naidu", "Sharma", "Devi", "Babu", "Chowdary", "Varma", "Murthy",
+])
+BUSINESS_SUFFIXES = {
+    "Commercial": np.array(["Stores", "Traders", "Hotel", "Textiles", "Medicals", "Enterprises"]),
+    "Industrial": np.array(["Mills", "Industries", "Cold Storage", "Rice Mill", "Granites", "Polymers"]),
+}
+
+
+def _repeat_categorical(values, times):
+    values = pd.Categorical(values)
+    return pd.Categorical.from_codes(np.repeat(values.codes, times), values.categories)
+
+
+def generate_block(seed, block, services, months, start_date, bad_rate=BAD_READING_RATE):
+    """Customers and readings for services block * BLOCK_SERVICES onwards.
+
+    Returns (customers, readings) DataFrames; readings hold months rows per
+    service, oldest first.
+    """
+    rng = np.random.default_rng([seed, block])
+    first_service = block * BLOCK_SERVICES
+    # Always draw a full block so a larger dataset starts with the same services
+    n = BLOCK_SERVICES
+
+    # Customers
+    service_ids = "SVC" + pd.Series(np.arange(first_service + 1, first_service + n + 1)).astype(str).str.zfill(SERVICE_ID_DIGITS)
+    types = np.array(CATEGORIES)[rng.choice(len(CATEGORIES), n, p=CATEGORY_MIX)]
+    names = pd.Series(FIRST_NAMES[rng.integers(len(FIRST_NAMES), size=n)]) + " " + SURNAMES[rng.integers(len(SURNAMES), size=n)]
+    for category, suffixes in BUSINESS_SUFFIXES.items():
+        business = types == category
+        names[business] = names[business] + " " + suffixes[rng.integers(len(suffixes), size=int(business.sum()))]
+    customers = pd.DataFrame({"Service_ID": service_ids, "Customer_Name": names, "Customer_Type": types}, columns=CUSTOMER_COLUMNS)
+
+    # Usual monthly consumption and meter size per service
+    median = np.zeros(n)
+    sigma = np.zeros(n)
+    meter_limit = np.zeros(n)
+    for category in CATEGORIES:
+        is_category = types == category
+        median[is_category], sigma[is_category] = CONSUMPTION[category]
+        meter_limit[is_category] = 10.0 ** METER_DIGITS[category]
+    usual = median * np.exp(sigma * rng.standard_normal(n))
+    vacant = (types == "Domestic") & (rng.random(n) < VACANT_SHARE)
+    usual[vacant] = rng.uniform(0, 5, size=int(vacant.sum()))
+
+    # Monthly units, seasonal and noisy, accumulated on a meter that wraps
+    calendar_months = (start_date.month - 1 + np.arange(months)) % 12
+    units = usual[:, None] * np.array(SEASONAL_FACTOR)[calendar_months] * np.exp(
+        MONTHLY_SIGMA * rng.standard_normal((n, months)))
+    units = np.round(units, 1)
+    start = np.floor(rng.uniform(0, meter_limit) * 10) / 10
+    cumulative = start[:, None] + np.cumsum(units, axis=1)
+    current = np.round(np.mod(cumulative, meter_limit[:, None]), 1)
+    previous = np.round(np.mod(cumulative - units, meter_limit[:, None]), 1)
+
+    is_industrial = (types == "Industrial")[:, None]
+    peak = np.where(is_industrial, np.round(units * rng.beta(*PEAK_SHARE_BETA, size=(n, months)), 1), 0.0)
+
+    # One meter-reading day per service, billed on that day every month
+    cycle_day = rng.integers(1, 29, size=n)
+    month_starts = pd.date_range(start_date.replace(day=1), periods=months, freq="MS").strftime("%Y-%m-")
+    bill_dates = np.char.add(
+        np.asarray(month_starts, dtype=str)[None, :],
+        np.char.zfill(cycle_day.astype(str), 2)[:, None]
+    )
+
+    flags = np.where(current < previous, "rollover", "ok").astype(object)
+
+    # Bad readings: keyed in wrongly, so the next month's reading is unaffected
+    bad = rng.random((n, months)) < bad_rate
+    kinds = np.array(BAD_READING_KINDS)[rng.integers(len(BAD_READING_KINDS), size=(n, months))]
+    kinds[(kinds == "peak_exceeds") & ~is_industrial] = "spike"
+    current = np.where(bad & (kinds == "missing"), np.nan, current)
+    current = np.where(bad & (kinds == "reversed"), np.round(np.maximum(previous - units, 0), 1), current)
+    current = np.where(bad & (kinds == "spike"), np.round(previous + units * 10, 1), current)
+    peak = np.where(bad & (kinds == "peak_exceeds"), np.round(units * 1.2, 1), peak)
+    flags = np.where(bad, kinds, flags)
+
+    # Text columns repeat a few values many times, so they are built as categoricals
+    readings = pd.DataFrame({
+        "Service_ID": _repeat_categorical(service_ids, months),
+        "Customer_Name": _repeat_categorical(names, months),
+        "Customer_Type": _repeat_categorical(types, months),
+        "Bill_Date": pd.Categorical(bill_dates.ravel()),
+        "Current_Reading": current.ravel(),
+        "Previous_Reading": previous.ravel(),
+        "Peak_Hour_Units": peak.ravel(),
+        "Reading_Flag": pd.Categorical(flags.ravel()),
+    }, columns=COLUMNS)
+    keep = min(n, services - first_service)
+    return customers.iloc[:keep], readings.iloc[:keep * months]
+
+
+def iter_chunks(rows, seed=0, months=12, start_date=datetime.date(2024, 4, 1),
+                chunk_rows=DEFAULT_CHUNK_ROWS, bad_rate=BAD_READING_RATE):
+    """Yield (customers, readings) DataFrames covering exactly rows readings"""
+    services = math.ceil(rows / months)
+    blocks = math.ceil(services / BLOCK_SERVICES)
+    remaining = rows
+    customer_parts, reading_parts, buffered = [], [], 0
+    for block in range(blocks):
+        customers, readings = generate_block(seed, block, services, months, start_date, bad_rate)
+        # The last service may get fewer months so the total comes out exact
+        readings = readings.iloc[:remaining]
+        remaining -= len(readings)
+        customer_parts.append(customers)
+        reading_parts.append(readings)
+        buffered += len(readings)
+        if buffered >= chunk_rows or block == blocks - 1:
+            yield pd.concat(customer_parts, ignore_index=True), pd.concat(reading_parts, ignore_index=True)
+            customer_parts, reading_parts, buffered = [], [], 0
+
+
+class ChunkWriter:
+    """Appends DataFrames to a CSV or Parquet file (chosen by extension)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith((".parquet", ".pq"))
+        if self.parquet and pa is None:
+            raise ValueError("Writing Parquet needs pyarrow (pip install pyarrow)")
+        self.writer = None
+        self.file = None
+
+    def write(self, frame):
+        if pa is None:
+            if self.file is None:
+                self.file = open(self.path, "w", newline="", encoding="utf-8")
+                frame.to_csv(self.file, index=False)
+            else:
+                frame.to_csv(self.file, index=False, header=False)
+            return
+        table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata(None)
+        # Categories differ between chunks, so write plain strings to keep one schema
+        table = pa.table({
+            name: column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+            for name, column in zip(table.column_names, table.columns)
+        })
+        if self.writer is None:
+            if self.parquet:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self.writer = pa_csv.CSVWriter(
+                    self.path, table.schema, write_options=pa_csv.WriteOptions(quoting_style="needed"))
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.file is not None:
+            self.file.close()
+
+
+def write_dataset(path, rows, seed=0, months=12, start_date=datetime.date(2024, 4, 1),
+                  chunk_rows=DEFAULT_CHUNK_ROWS, bad_rate=BAD_READING_RATE, customers_path=None,
+                  progress_callback=None):
+    """Stream rows synthetic readings to path, and the customer master to customers_path if given"""
+    readings_writer = ChunkWriter(path)
+    customers_writer = ChunkWriter(customers_path) if customers_path else None
+    done = 0
+    try:
+        for customers, readings in iter_chunks(rows, seed, months, start_date, chunk_rows, bad_rate):
+            readings_writer.write(readings)
+            if customers_writer:
+                customers_writer.write(customers)
+            done += len(readings)
+            if progress_callback:
+                progress_callback(done, rows)
+    finally:
+        readings_writer.close()
+        if customers_writer:
+            customers_writer.close()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic meter readings")
+    parser.add_argument("--rows", type=int, default=1000, help="Number of readings (10^3 to 10^8)")
+    parser.add_argument("--out", default="synthetic_readings.csv", help="Output file (.csv or .parquet)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--months", type=int, default=12, help="Monthly readings per service")
+    parser.add_argument("--start", default="2024-04-01", help="First bill month (YYYY-MM-DD)")
+    parser.add_argument("--bad-rate", type=float, default=BAD_READING_RATE, help="Share of bad readings")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows held in memory at once")
+    parser.add_argument("--customers", default=None, help="Also write the customer master to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def report(done, total):
+        elapsed = time.perf_counter() - start
+        print(f"\r{done:,} of {total:,} rows, {done / elapsed:,.0f} rows/s", end="", flush=True)
+
+    rows = write_dataset(
+        args.out, args.rows, args.seed, args.months, datetime.datetime.strptime(args.start, "%Y-%m-%d").date(),
+        args.chunk_rows, args.bad_rate, args.customers, report
+    )
+    print(f"\nWrote {rows:,} readings to {args.out} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from bill_calculator import BillCalculator
+
+BILL_FIELDS = ["units_consumed", "bill_date", "due_date", "net_bill", "service_charge",
+               "total_bill", "late_fee", "amount_after_due_date"]
+
+
+@pytest.fixture
+def calculator():
+    return BillCalculator()
+
+
+@pytest.mark.parametrize("customer_type,previous,current,peak", [
+    ("Domestic", 1000, 1000, 0),
+    ("Domestic", 1000, 1099.5, 0),
+    ("Domestic", 1000, 1100, 0),
+    ("Domestic", 1000, 1100.5, 0),
+    ("Domestic", 1000, 1200, 0),
+    ("Domestic", 1000, 1200.5, 0),
+    ("Domestic", 1000, 1457.33, 0),
+    ("Commercial", 500, 500, 0),
+    ("Commercial", 500, 623.37, 0),
+    ("Industrial", 0, 0, 10),
+    ("Industrial", 0, 400, 150),
+    ("Industrial", 0, 400, 400),
+    ("Industrial", 0, 400, 650),
+])
+def test_calculate_bills_matches_calculate_bill(calculator, customer_type, previous, current, peak):
+    expected = calculator.calculate_bill(customer_type, current, previous, "2025-04-01", peak)
+
+    row = calculator.calculate_bills(pd.DataFrame([{
+        "Customer_Type": customer_type, "Current_Reading": current, "Previous_Reading": previous,
+        "Bill_Date": "2025-04-01", "Peak_Hour_Units": peak,
+    }])).iloc[0]
+
+    assert pd.isna(row["error"])
+    assert [row[field] for field in BILL_FIELDS] == [expected[field] for field in BILL_FIELDS]
+
+
+def test_calculate_bills_rejects_what_calculate_bill_rejects(calculator):
+    readings = pd.DataFrame([
+        {"Customer_Type": "Domestic", "Current_Reading": 90, "Previous_Reading": 100, "Bill_Date": "2025-04-01"},
+        {"Customer_Type": "Farm", "Current_Reading": 110, "Previous_Reading": 100, "Bill_Date": "2025-04-01"},
+        {"Customer_Type": "Domestic", "Current_Reading": 110, "Previous_Reading": 100, "Bill_Date": "01/04/2025"},
+    ])
+
+    bills = calculator.calculate_bills(readings)
+
+    for reading, error in zip(readings.to_dict("records"), bills["error"]):
+        with pytest.raises(ValueError):
+            calculator.calculate_bill(reading["Customer_Type"], reading["Current_Reading"],
+                                      reading["Previous_Reading"], reading["Bill_Date"])
+        assert error
+    assert bills["total_bill"].isna().all()
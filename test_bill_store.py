@@ -0,0 +1,92 @@
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from bill_store import BillStore
+from bulk_billing import BulkBillingRun, sample_readings_csv
+from reconciliation import ReconciliationRun
+
+
+def make_bill(n, service_id="SVC0001", customer_type="Domestic", units=150.0, bill_date="2025-04-01"):
+    return {
+        "invoice_no": f"AP-TEST-{n:06d}", "service_id": service_id, "customer_name": "Test",
+        "customer_type": customer_type, "bill_date": bill_date, "due_date": "2025-04-22",
+        "units_consumed": units, "net_bill": units * 3, "service_charge": units * 0.15,
+        "total_bill": units * 3.15, "late_fee": units * 0.063, "amount_after_due_date": units * 3.213,
+    }
+
+
+def aggregates(store):
+    with store.connect() as conn:
+        return {
+            table: sorted(tuple(row) for row in conn.execute(f"SELECT * FROM {table}"))
+            for table in ["monthly_service_totals", "monthly_category_totals", "units_log_histogram", "due_date_totals"]
+        }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BillStore(str(tmp_path / "ledger.db"))
+
+
+def test_histogram_buckets_double_in_width(store):
+    store.add_bills(pd.DataFrame([
+        make_bill(1, units=0), make_bill(2, units=99.9), make_bill(3, units=100), make_bill(4, units=200),
+        make_bill(5, customer_type="Industrial", units=75000), make_bill(6, customer_type="Industrial", units=5e6),
+    ]))
+
+    histogram = store.units_histogram()
+
+    assert list(zip(histogram["customer_type"], histogram["units_range"], histogram["bill_count"])) == [
+        ("Domestic", "0-25", 1), ("Domestic", "50-100", 1), ("Domestic", "100-200", 1), ("Domestic", "200-400", 1),
+        ("Industrial", "51200-102400", 1), ("Industrial", "409600+", 1),
+    ]
+    incremental = aggregates(store)
+    store.rebuild_aggregates()
+    assert aggregates(store) == incremental
+
+
+def test_old_fixed_width_histogram_is_replaced(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    BillStore(path).add_bills(pd.DataFrame([make_bill(1, units=250), make_bill(2, units=30)]))
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE units_histogram (customer_type TEXT, bucket INTEGER, bill_count INTEGER)")
+        conn.execute("DELETE FROM units_log_histogram")
+
+    store = BillStore(path)
+
+    assert store.units_histogram()["units_range"].tolist() == ["25-50", "200-400"]
+    with store.connect() as conn:
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'units_histogram'").fetchone()
+
+
+def test_bill_history_reads_the_ledger(store):
+    store.add_bills(pd.DataFrame([
+        make_bill(1, service_id="svc0001 ", bill_date="2025-03-01"), make_bill(2, service_id="SVC0002"),
+        make_bill(3, service_id="SVC0001", bill_date="2025-04-01"),
+    ]))
+
+    assert store.recent_services() == ["SVC0001", "SVC0002"]
+    assert store.service_bills("svc0001")["invoice_no"].tolist() == ["AP-TEST-000003", "AP-TEST-000001"]
+
+
+def test_reversed_run_leaves_aggregates_as_if_never_written(store, tmp_path):
+    store.add_bills(pd.DataFrame([make_bill(1, service_id="SVC0009")]), "job-0")
+    BulkBillingRun(work_dir=str(tmp_path)).process(
+        io.BytesIO(sample_readings_csv().encode()), "readings.csv", bill_store=store, run_id="job-1")
+    payments = pd.DataFrame([["SVC0001", 100.0, "2025-04-10", "UPI-1"], ["SVC0009", 50.0, "2025-04-10", "UPI-2"]],
+                            columns=["Service_ID", "Amount", "Payment_Date", "Reference"])
+    ReconciliationRun(store, work_dir=str(tmp_path)).process(
+        io.BytesIO(payments.to_csv(index=False).encode()), "payments.csv", run_id="job-2")
+
+    assert store.reverse_run("job-1") == (3, 0)
+
+    incremental = aggregates(store)
+    store.rebuild_aggregates()
+    assert aggregates(store) == incremental
+    assert incremental["monthly_service_totals"] == [("SVC0009", "2025-04", 1, 150.0, pytest.approx(472.5))]
+    with store.connect() as conn:
+        assert sorted(tuple(row) for row in conn.execute("SELECT reference, bill_id IS NULL, status FROM payments")) == [
+            ("UPI-1", 1, "unmatched"), ("UPI-2", 0, "partial")]
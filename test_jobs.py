@@ -0,0 +1,105 @@
+import functools
+import os
+import threading
+
+import pytest
+
+import jobs
+from bill_store import BillStore
+from bulk_billing import sample_readings_csv
+from jobs import JobCancelled, JobQueue
+
+
+@pytest.fixture
+def bill_store(tmp_path, monkeypatch):
+    path = str(tmp_path / "ledger.db")
+    monkeypatch.setattr(jobs, "BillStore", functools.partial(BillStore, path))
+    return BillStore(path)
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def submit_bulk_billing(job_queue, tmp_path, name="run"):
+    work_dir = tmp_path / name
+    work_dir.mkdir()
+    upload = work_dir / "upload_readings.csv"
+    upload.write_text(sample_readings_csv())
+    return job_queue.submit("bulk_billing", {"path": str(upload), "filename": "readings.csv", "work_dir": str(work_dir)})
+
+
+def bill_count(bill_store):
+    with bill_store.connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM bills").fetchone()[0]
+
+
+def make_stale(job_queue, job_id):
+    with job_queue.connect() as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = '2000-01-01T00:00:00' WHERE id = ?", (job_id,))
+
+
+def test_two_workers_never_claim_the_same_job(job_queue, tmp_path):
+    job_ids = [submit_bulk_billing(job_queue, tmp_path, f"run{n}") for n in range(20)]
+    claimed = {1: [], 2: []}
+    start = threading.Barrier(2)
+
+    def worker(pid):
+        start.wait()
+        while (job := job_queue.claim(pid)) is not None:
+            claimed[pid].append(job["id"])
+
+    threads = [threading.Thread(target=worker, args=(pid,)) for pid in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed[1] + claimed[2]) == job_ids
+    assert all(job_queue.status(job_id)["status"] == "running" for job_id in job_ids)
+
+
+def test_cancelled_queued_job_is_never_claimed(job_queue, tmp_path):
+    job_id = submit_bulk_billing(job_queue, tmp_path)
+
+    assert job_queue.cancel(job_id)
+    assert job_queue.status(job_id)["status"] == "cancelled"
+    assert job_queue.claim(1) is None
+
+
+def test_cancelled_running_job_is_undone(job_queue, bill_store, tmp_path):
+    job_id = submit_bulk_billing(job_queue, tmp_path)
+    job = job_queue.claim(1)
+
+    assert job_queue.cancel(job_id)
+    jobs.run_job(job_queue, job)
+
+    assert job_queue.status(job_id)["status"] == "cancelled"
+    assert bill_count(bill_store) == 0
+    assert bill_store.category_monthly().empty
+    assert not os.path.exists(job["params"]["work_dir"])
+
+
+def test_lapsed_lease_is_failed_and_undone_once(job_queue, bill_store, tmp_path, monkeypatch):
+    discard = jobs.discard_job_output
+    job_id = submit_bulk_billing(job_queue, tmp_path)
+    job = job_queue.claim(1)
+    # The worker wrote its bills, then stopped renewing the lease
+    result = jobs.JOB_HANDLERS["bulk_billing"](job["params"], lambda done, total: None, jobs.ledger_run_id(job))
+    make_stale(job_queue, job_id)
+
+    undone = []
+    monkeypatch.setattr(jobs, "discard_job_output", lambda lost_job: undone.append(lost_job["id"]) or discard(lost_job))
+
+    # Two idle workers both run maintenance
+    jobs.maintain(job_queue)
+    jobs.maintain(job_queue)
+
+    assert undone == [job_id]
+    assert job_queue.status(job_id)["status"] == "failed"
+    assert bill_count(bill_store) == 0
+    assert not os.path.exists(job["params"]["work_dir"])
+    assert not job_queue.finish(job_id, "done", result)
+    with pytest.raises(JobCancelled):
+        job_queue.report_progress(job_id, 1, 1)
@@ -0,0 +1,107 @@
+import io
+
+import pandas as pd
+import pytest
+
+from bill_store import BillStore
+from bulk_billing import BulkBillingRun, sample_readings_csv
+from reconciliation import ReconciliationRun
+
+
+@pytest.fixture
+def bill_store(tmp_path):
+    store = BillStore(str(tmp_path / "ledger.db"))
+    BulkBillingRun(work_dir=str(tmp_path)).process(
+        io.BytesIO(sample_readings_csv().encode()), "readings.csv", bill_store=store)
+    return store
+
+
+def reconcile(bill_store, tmp_path, rows, apply=True):
+    payments = pd.DataFrame(rows, columns=["Service_ID", "Amount", "Payment_Date", "Reference"])
+    run = ReconciliationRun(bill_store, work_dir=str(tmp_path))
+    run.process(io.BytesIO(payments.to_csv(index=False).encode()), "payments.csv", apply)
+    return run, pd.read_csv(run.results_path)
+
+
+def paid_amounts(bill_store):
+    with bill_store.connect() as conn:
+        return dict(conn.execute("SELECT bill_id, paid_amount FROM bill_payments").fetchall())
+
+
+def test_unreadable_date_and_amount_are_reported_not_recorded(bill_store, tmp_path):
+    run, results = reconcile(bill_store, tmp_path, [
+        ["SVC0001", 100.0, "not a date", "UPI-1"],
+        ["SVC0002", "abc", "2025-04-10", "UPI-2"],
+        ["SVC0003", 500.0, "2025-04-10", "UPI-3"],
+    ])
+
+    assert results["Status"].tolist() == ["invalid", "invalid", "partial"]
+    assert results["Note"].iloc[0] == "Unreadable Payment_Date: not a date"
+    assert results["Note"].iloc[1] == "Unreadable Amount: abc"
+    assert run.summary["invalid"]["count"] == 2
+    with bill_store.connect() as conn:
+        assert [tuple(row) for row in conn.execute("SELECT reference FROM payments")] == [("UPI-3",)]
+
+
+def test_resent_file_is_not_credited_twice(bill_store, tmp_path):
+    rows = [["SVC0001", 100.0, "2025-04-10", "UPI-1"], ["SVC0002", 200.0, "2025-04-10", "UPI-2"]]
+    reconcile(bill_store, tmp_path, rows)
+    paid = paid_amounts(bill_store)
+
+    run, results = reconcile(bill_store, tmp_path, rows)
+
+    assert results["Status"].tolist() == ["duplicate", "duplicate"]
+    assert run.summary["duplicate"]["count"] == 2
+    assert paid_amounts(bill_store) == paid
+
+
+def test_repeated_reference_within_a_file_is_a_duplicate(bill_store, tmp_path):
+    _, results = reconcile(bill_store, tmp_path, [
+        ["SVC0001", 100.0, "2025-04-10", "UPI-1"],
+        ["SVC0001", 100.0, "2025-04-10", "UPI-1"],
+        ["SVC0001", 50.0, "2025-04-11", ""],
+        ["SVC0001", 50.0, "2025-04-11", ""],
+    ], apply=False)
+
+    assert results["Status"].tolist() == ["partial", "duplicate", "partial", "partial"]
+
+
+def test_payment_dates_use_one_format(bill_store, tmp_path):
+    rows = [["SVC0001", 100.0, "2025-04-10", "UPI-1"], ["SVC0002", 200.0, "10/04/2025", "UPI-2"]]
+    payments = pd.DataFrame(rows, columns=["Service_ID", "Amount", "Payment_Date", "Reference"])
+
+    iso = ReconciliationRun(bill_store, work_dir=str(tmp_path))
+    dayfirst = ReconciliationRun(bill_store, work_dir=str(tmp_path), dayfirst=True)
+
+    assert iso.prepare_chunk(payments.copy())["Note"].tolist() == ["", "Unreadable Payment_Date: 10/04/2025"]
+    assert dayfirst.prepare_chunk(payments.copy())["Note"].tolist() == ["Unreadable Payment_Date: 2025-04-10", ""]
+    assert dayfirst.prepare_chunk(payments.copy())["Payment_Date"].iloc[1] == "2025-04-10"
+
+
+def test_shared_invoice_number_matches_one_bill(bill_store, tmp_path):
+    with bill_store.connect() as conn:
+        conn.execute("UPDATE bills SET invoice_no = 'AP-SHARED', service_id = 'SVC0001'")
+    payments = pd.DataFrame([["SVC0001", "AP-SHARED", 100.0, "2025-04-10", "UPI-1"]],
+                            columns=["Service_ID", "Invoice_No", "Amount", "Payment_Date", "Reference"])
+
+    run = ReconciliationRun(bill_store, work_dir=str(tmp_path))
+    results = run.reconcile_chunk(run.prepare_chunk(payments))
+
+    assert len(results) == 1
+    assert results["Bill_Invoice_No"].tolist() == ["AP-SHARED"]
+    with bill_store.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0] == 1
+
+
+def test_billing_runs_never_share_invoice_numbers(tmp_path):
+    first = BulkBillingRun(work_dir=str(tmp_path)).bill_chunk(pd.read_csv(io.StringIO(sample_readings_csv())), 0)
+    second = BulkBillingRun(work_dir=str(tmp_path)).bill_chunk(pd.read_csv(io.StringIO(sample_readings_csv())), 0)
+
+    assert not set(first["Invoice_No"]) & set(second["Invoice_No"])
+
+
+def test_service_ids_match_whatever_their_case(bill_store, tmp_path):
+    _, results = reconcile(bill_store, tmp_path, [[" svc0001 ", 100.0, "2025-04-10", "UPI-1"]])
+
+    assert results["Status"].tolist() == ["partial"]
+    assert bill_store.last_bill("svc0003 ")["service_id"] == "SVC0003"
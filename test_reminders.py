@@ -0,0 +1,76 @@
+import json
+
+import pandas as pd
+import pytest
+
+from bill_store import BillStore
+from reminders import FileOutbox, ReminderScheduler, superseded
+
+
+def make_bill(n):
+    # Backdated: due on 2025-04-22, so due_soon is 04-15, due_today 04-22 and overdue 04-23
+    return {
+        "invoice_no": f"AP-TEST-{n:06d}", "service_id": f"SVC{n:04d}", "customer_name": "Test",
+        "customer_type": "Domestic", "bill_date": "2025-04-01", "due_date": "2025-04-22",
+        "units_consumed": 100.0, "net_bill": 150.0, "service_charge": 7.5,
+        "total_bill": 157.5, "late_fee": 3.15, "amount_after_due_date": 160.65,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BillStore(str(tmp_path / "ledger.db"))
+    store.add_bills(pd.DataFrame([make_bill(1), make_bill(2)]))
+    return store
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return FileOutbox(str(tmp_path / "outbox.jsonl"))
+
+
+def sent(outbox):
+    with open(outbox.path, encoding="utf-8") as f:
+        return [(n["invoice_no"], n["kind"]) for n in map(json.loads, f)]
+
+
+def pay(store, n, amount):
+    with store.connect() as conn:
+        bill_id = conn.execute("SELECT id FROM bills WHERE invoice_no = ?", (f"AP-TEST-{n:06d}",)).fetchone()[0]
+    store.add_payments(pd.DataFrame([{
+        "bill_id": bill_id, "service_id": f"SVC{n:04d}", "invoice_no": f"AP-TEST-{n:06d}",
+        "payment_date": "2025-04-20", "amount": amount, "reference": f"UPI-{n}", "status": "matched",
+        "due_date": "2025-04-22", "customer_type": "Domestic", "credited": min(amount, 157.5),
+    }]))
+
+
+def test_superseded_once_the_next_kind_is_due():
+    reminder = {"due_date": "2025-04-22"}
+
+    assert not superseded({**reminder, "kind": "due_soon"}, "2025-04-21")
+    assert superseded({**reminder, "kind": "due_soon"}, "2025-04-22")
+    assert superseded({**reminder, "kind": "due_today"}, "2025-04-23")
+    assert not superseded({**reminder, "kind": "overdue"}, "2026-01-01")
+
+
+def test_backdated_ledger_sends_one_reminder_per_bill(store, outbox):
+    assert ReminderScheduler(store, outbox).tick("2025-05-01") == (2, 4)
+
+    assert sent(outbox) == [("AP-TEST-000001", "overdue"), ("AP-TEST-000002", "overdue")]
+    assert ReminderScheduler(store, outbox).tick("2025-05-01") == (0, 0)
+
+
+def test_stale_kind_in_its_own_batch_is_skipped(store, outbox):
+    # With one reminder per batch the latest-kind selection cannot see the later kinds
+    assert ReminderScheduler(store, outbox, batch_size=1).tick("2025-05-01") == (2, 4)
+
+    assert sent(outbox) == [("AP-TEST-000001", "overdue"), ("AP-TEST-000002", "overdue")]
+
+
+def test_overdue_bill_paid_without_late_fee_is_still_reminded(store, outbox):
+    pay(store, 1, 157.5)
+    pay(store, 2, 160.65)
+
+    assert ReminderScheduler(store, outbox).tick("2025-04-22") == (0, 4)
+    assert ReminderScheduler(store, outbox).tick("2025-04-23") == (1, 1)
+    assert sent(outbox) == [("AP-TEST-000001", "overdue")]